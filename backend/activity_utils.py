@@ -0,0 +1,139 @@
+import atexit
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Spooled activity-log writer.
+#
+# Request threads append events to a local sqlite spool (ACTIVITY_SPOOL_DIR,
+# shared by all workers on a host); a background thread in every worker
+# writes them to the database with multi-row inserts once ACTIVITY_BATCH_SIZE
+# events are waiting or every ACTIVITY_FLUSH_INTERVAL seconds.
+#
+# Delivery is at least once. An event leaves the spool only after its batch
+# is committed. A writer claims a batch before writing it; a claim older than
+# ACTIVITY_CLAIM_TIMEOUT seconds (its worker was killed mid-write) is taken
+# over by the next flush, in any worker or after a restart, so a batch whose
+# commit outcome is unknown may be written twice. Keep the spool directory on
+# a volume that survives container restarts.
+
+
+class ActivityWriter:
+    def __init__(self, write_rows, directory=None, batch_size=None, interval=None, claim_timeout=None):
+        self.write_rows = write_rows
+        directory = directory or os.getenv("ACTIVITY_SPOOL_DIR", "/tmp/maxprofit-activity")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "activity_spool.sqlite")
+        self.batch_size = batch_size or int(os.getenv("ACTIVITY_BATCH_SIZE", "100"))
+        self.interval = interval or float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "1.0"))
+        self.claim_timeout = claim_timeout or float(os.getenv("ACTIVITY_CLAIM_TIMEOUT", "60"))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._added = 0
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, event BLOB NOT NULL, claimed REAL)"
+        )
+        atexit.register(self.close)
+
+    def _connect(self):
+        # One connection per thread and process (connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def add(self, **event):
+        self.start()
+        self._connect().execute("INSERT INTO events (event) VALUES (?)", (pickle.dumps(event),))
+        with self._lock:
+            self._added += 1
+            if self._added >= self.batch_size:
+                self._added = 0
+                self._wake.set()
+
+    def pending(self):
+        # Events not yet written, oldest first. Claimed events are left out:
+        # they are being written and may already be visible as rows, so read
+        # the rows first and this second and no event is listed twice.
+        self.start()
+        rows = self._connect().execute("SELECT event FROM events WHERE claimed IS NULL ORDER BY id").fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def start(self):
+        # Threads do not survive a fork; every process starts its own writer,
+        # which also writes whatever earlier processes left in the spool.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                written = self.flush()
+            except Exception:
+                logger.exception("Activity spool unavailable, will retry")
+                written = False
+            if self._stopping:
+                return
+            if written:
+                backoff = self.interval
+            else:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _claim(self, conn):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, event FROM events WHERE claimed IS NULL OR claimed < ? ORDER BY id LIMIT ?",
+                (now - self.claim_timeout, self.batch_size)
+            ).fetchall()
+            conn.executemany("UPDATE events SET claimed = ? WHERE id = ?", [(now, row[0]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def flush(self):
+        # Write everything currently spooled; False if a batch failed
+        conn = self._connect()
+        while True:
+            batch = self._claim(conn)
+            if not batch:
+                return True
+            ids = [(row[0],) for row in batch]
+            try:
+                self.write_rows([pickle.loads(row[1]) for row in batch])
+            except Exception:
+                logger.exception("Failed to write %d activity events, will retry", len(batch))
+                conn.executemany("UPDATE events SET claimed = NULL WHERE id = ?", ids)
+                return False
+            conn.executemany("DELETE FROM events WHERE id = ?", ids)
+
+    def close(self, timeout=10):
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
@@ -1,23 +1,49 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response, g
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
-from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
-from sqlalchemy import and_, select, func
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import and_, select, func, event, exists, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import aliased
-from sqlalchemy import extract
+from sqlalchemy.orm import aliased, object_session
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from functools import wraps
+import hashlib
+import json
+import click
+import logging
+import math
+import numpy as np
 import os
+import threading
 
 # JWT utility functions (assuming you have jwt_utils.py)
 from jwt_utils import token_required, generate_token
+import migrations
+import query_plans
+from calendar_utils import all_holidays, working_hours_many
+from prorate_utils import prorate_by_month, to_days
+import cache_utils
+from import_utils import ImportFormatError, batched, parse_number, read_rows
+from pagination_utils import PaginationError, paginate, page_query, parse_limit, apply_filters, apply_date_range
+from search_utils import UserSearchIndex
+from stream_utils import EXPORT_FORMATS, export_response, json_array_response
+from password_utils import PasswordBusy, hash_password, verify_password, needs_rehash
+from pool_utils import RoutingSession, engine_options, pool_stats
+from log_utils import setup_logging
+from activity_utils import ActivityWriter
+from metrics_utils import Metrics, clear_shared_dir
+from compress_utils import Compressor
 
 
 # ------------------ CONFIGURATION ------------------
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)
 
@@ -30,25 +56,215 @@ DB_NAME = os.getenv("DB_NAME")
 app.config['SQLALCHEMY_DATABASE_URI'] = (
     f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
-print("🔧 DB URI:", app.config['SQLALCHEMY_DATABASE_URI'])
+logger.info("Database: %s", make_url(app.config['SQLALCHEMY_DATABASE_URI']).render_as_string(hide_password=True))
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.getenv("JWT_SECRET")
 
-db = SQLAlchemy(app)
+# Transactional requests and the long report endpoints get separate pools
+# (DB_POOL_* / DB_REPORT_POOL_*); REPORTS_DATABASE_URI can point reports at a replica.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options("DB_POOL")
+app.config['SQLALCHEMY_BINDS'] = {
+    "reports": {
+        "url": os.getenv("REPORTS_DATABASE_URI", app.config['SQLALCHEMY_DATABASE_URI']),
+        **engine_options("DB_REPORT_POOL")
+    }
+}
+
+db = SQLAlchemy(app, session_options={"class_": RoutingSession})
 jwt = JWTManager(app)
+metrics = Metrics(app)
+compressor = Compressor(app)  # registered after metrics so it runs first: metrics sees bytes sent
 
 # ------------------ CONSTANTS ------------------
 
 ROLES = ["admin", "department_manager", "project_manager", "financial_analyst", "employee"]
 
+# Cache tags are table names; anything derived from assignments depends on all of these.
+# Budgets only read a few user columns, so they use USER_BUDGET_TAG instead of
+# "user": logins (password rehash), status and role changes leave them cached.
+USER_BUDGET_TAG = "user:budget"
+USER_BUDGET_COLUMNS = ("eid", "fname", "lname", "email")
+BUDGET_TAGS = ("project", "project_assignment", "project_assignees", "project_financials",
+               "project_monthly_rollup", "department", "department_managers", USER_BUDGET_TAG)
+
+# ------------------ DATABASE ------------------
+
+def use_bind(key):
+    # Run the route's reads on the given engine (and its own pool)
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            g.db_bind = key
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                g.db_bind = None
+        return wrapper
+    return decorator
+
+
+@app.route('/healthz/ready', methods=['GET'])
+def readiness():
+    engines, ready = {}, True
+    for key, engine in db.engines.items():
+        name = key or "default"
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            engines[name] = {"ok": True, **pool_stats(engine)}
+        except SQLAlchemyError as e:
+            ready = False
+            engines[name] = {"ok": False, "error": str(e.__class__.__name__), **pool_stats(engine)}
+    return jsonify({"ready": ready, "engines": engines}), 200 if ready else 503
+
+# ------------------ METRICS ------------------
+
+# Prometheus scrape target; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# ------------------ CACHE ------------------
+
+response_cache = cache_utils.create_cache()
+
+
+def _current_identity():
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        return None
+    return [claims.get("sub"), claims.get("role")]
+
+
+def cached(*tags, ttl=None):
+    # Cache successful GET responses per endpoint, query string and caller.
+    # Entries are dropped when a commit touches any of the given tables.
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or not response_cache.enabled:
+                return fn(*args, **kwargs)
+
+            key = response_cache.make_key(
+                request.endpoint,
+                list(request.args.items(multi=True)) + list(kwargs.items()),
+                _current_identity(),
+                tags
+            )
+            if key is None:
+                return fn(*args, **kwargs)
+            hit = response_cache.get(key)
+            if hit is not None:
+                body, status, mimetype = hit
+                response = app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response_cache.set(key, (response.get_data(), 200, response.mimetype), ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+
+@event.listens_for(db.session, 'before_flush')
+def _track_flushed_tables(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _changed_tables(session).add(table.name)
+        if isinstance(obj, User) and obj not in session.new:
+            state = db.inspect(obj)
+            if obj in session.deleted or any(state.attrs[c].history.has_changes() for c in USER_BUDGET_COLUMNS):
+                _changed_tables(session).add(USER_BUDGET_TAG)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _track_executed_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_tables(session):
+    tables = session.info.pop('changed_tables', None)
+    if tables and response_cache.enabled:
+        response_cache.invalidate(*tables)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_tables(session):
+    session.info.pop('changed_tables', None)
+
+# ------------------ CONDITIONAL REQUESTS ------------------
+
+@event.listens_for(db.session, 'before_commit')
+def _bump_table_versions(session):
+    # Bump a per-table version counter in the same transaction as the write,
+    # so list endpoints can build an ETag without reading the table itself.
+    session.flush()
+    tables = _changed_tables(session) - {TableVersion.__tablename__}
+    if not tables:
+        return
+    bump = mysql_insert(TableVersion).values([
+        {"table_name": name, "version": 1} for name in sorted(tables)
+    ])
+    session.execute(bump.on_duplicate_key_update(version=TableVersion.version + 1))
+
+
+def table_versions(tables):
+    rows = db.session.query(TableVersion.table_name, TableVersion.version).filter(
+        TableVersion.table_name.in_(tables)
+    ).all()
+    versions = dict(rows)
+    return [versions.get(name, 0) for name in tables]
+
+
+def conditional(*tables):
+    # Answer If-None-Match with 304 when none of the given tables changed.
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return fn(*args, **kwargs)
+
+            raw = json.dumps([request.full_path, _current_identity(), table_versions(tables)])
+            etag = hashlib.sha1(raw.encode()).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
 # ------------------ MODELS ------------------
 
 project_assignees = db.Table(
     'project_assignees',
     db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('role', db.String(100))
+    db.Column('role', db.String(100)),
+    db.Index('ix_project_assignees_user_id_role', 'user_id', 'role')
 )
 
 class Role(db.Model):
@@ -61,12 +277,16 @@ class Role(db.Model):
 # In app.py or routes.py
 @app.route('/api/roles', methods=['GET'])
 @jwt_required()
+@cached("role")
 def get_roles():
     roles = Role.query.all()
     return jsonify([r.role for r in roles])
 
 class EmployeeFinancials(db.Model):
     __tablename__ = 'employee_financials'
+    __table_args__ = (
+        db.UniqueConstraint('eid', 'financial_year', name='uq_employee_financials_eid_year'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     eid = db.Column(db.String(20), nullable=False)  # FK removed
@@ -92,6 +312,9 @@ from sqlalchemy import Date
 
 class ProjectAssignment(db.Model):
     __tablename__ = 'project_assignment'
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'user_id', name='uq_project_assignment_project_user'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -107,6 +330,14 @@ class ProjectAssignment(db.Model):
     actual_cost = db.Column(db.Float, nullable=True)  # 👈 Add this
 
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_role_status', 'role', 'status'),
+        db.Index('ix_user_fname_id', 'fname', 'id'),
+        db.Index('ix_user_lname_id', 'lname', 'id'),
+        db.Index('ix_user_joinDate_id', 'joinDate', 'id'),
+        db.Index('ix_user_createdAt_id', 'createdAt', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     eid = db.Column(db.String(20), unique=True)
     fname = db.Column(db.String(100))
@@ -114,12 +345,13 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True)
     password = db.Column(db.String(200))
     role = db.Column(db.String(50))
-    did = db.Column(db.String(20))
+    did = db.Column(db.String(20), index=True)
     working_hours = db.Column(db.Integer, default=0)
     joinDate = db.Column(db.Date)
     status = db.Column(db.String(50))
     createdAt = db.Column(db.DateTime, default=datetime.utcnow)
     updatedAt = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 class Organisation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -133,15 +365,30 @@ class Department(db.Model):
     did = db.Column(db.String(20), unique=True)
     name = db.Column(db.String(100))
     oid = db.Column(db.String(20))
-    managerId = db.Column(db.String(100))
-    managerIds = db.Column(db.Text, nullable=True) 
+    managerId = db.Column(db.String(100), index=True)
+    managerIds = db.Column(db.Text, nullable=True)  # compatibility copy of department_managers
     createdAt = db.Column(db.DateTime, default=datetime.utcnow)
     updatedAt = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
+# Source of truth for who manages which department; position 0 is the primary manager
+department_managers = db.Table(
+    'department_managers',
+    db.Column('department_did', db.String(20), db.ForeignKey('department.did', ondelete='CASCADE'),
+              primary_key=True),
+    db.Column('manager_eid', db.String(20), primary_key=True),
+    db.Column('position', db.Integer, nullable=False, default=0),
+    db.Index('ix_department_managers_manager_eid', 'manager_eid')
+)
+
 class Project(db.Model):
+    __table_args__ = (
+        db.Index('ix_project_startDate_endDate', 'startDate', 'endDate'),
+        db.Index('ix_project_endDate', 'endDate'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100))
-    departmentId = db.Column(db.String(20))
+    name = db.Column(db.String(100), index=True)
+    departmentId = db.Column(db.String(20), index=True)
     startDate = db.Column(db.Date)
     endDate = db.Column(db.Date)
     budget = db.Column(db.Float)
@@ -153,7 +400,245 @@ class ActivityLog(db.Model):
     type = db.Column(db.String(50))
     name = db.Column(db.String(100))
     action = db.Column(db.String(50))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class ActivityLogArchive(db.Model):
+    __tablename__ = 'activity_log_archive'
+
+    # Rows moved out of activity_log by `flask --app app prune-activity`
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    type = db.Column(db.String(50))
+    name = db.Column(db.String(100))
+    action = db.Column(db.String(50))
+    timestamp = db.Column(db.DateTime, index=True)
+
+class ProjectMonthlyRollup(db.Model):
+    __tablename__ = 'project_monthly_rollup'
+
+    # One row per project and month, assignments prorated by working day (year/month 0 = no start date)
+    project_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    department_id = db.Column(db.String(20), index=True)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    actual_cost = db.Column(db.Float, nullable=False, default=0)
+    margin = db.Column(db.Float, nullable=False, default=0)
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_version'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ProjectFinancials(db.Model):
+    __tablename__ = 'project_financials'
+
+    project_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_cost = db.Column(db.Float, nullable=False, default=0)
+    actual_cost = db.Column(db.Float, nullable=False, default=0)
+    margin = db.Column(db.Float, nullable=False, default=0)
+    assignment_count = db.Column(db.Integer, nullable=False, default=0)
+    assignee_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# ------------------ DEPARTMENT MANAGERS ------------------
+
+def managed_departments_query(eid):
+    return Department.query.join(
+        department_managers, department_managers.c.department_did == Department.did
+    ).filter(department_managers.c.manager_eid == eid)
+
+
+def department_manager_ids(dids):
+    # {did: [eid, ...]} in manager order, one indexed query for all departments
+    rows = db.session.execute(
+        select(department_managers.c.department_did, department_managers.c.manager_eid)
+        .where(department_managers.c.department_did.in_(dids))
+        .order_by(department_managers.c.department_did, department_managers.c.position)
+    ).all()
+    managers = {did: [] for did in dids}
+    for did, eid in rows:
+        managers[did].append(eid)
+    return managers
+
+
+def manages_other_department(eid, exclude_did=None):
+    query = select(department_managers.c.department_did).where(department_managers.c.manager_eid == eid)
+    if exclude_did is not None:
+        query = query.where(department_managers.c.department_did != exclude_did)
+    return db.session.execute(select(query.exists())).scalar()
+
+
+def set_department_managers(dept, manager_ids):
+    # Replace the department's managers and keep the managerId/managerIds
+    # columns in step for older readers.
+    manager_ids = list(dict.fromkeys(manager_ids))
+    db.session.flush()
+    db.session.execute(
+        department_managers.delete().where(department_managers.c.department_did == dept.did)
+    )
+    if manager_ids:
+        db.session.execute(department_managers.insert(), [
+            {"department_did": dept.did, "manager_eid": eid, "position": i}
+            for i, eid in enumerate(manager_ids)
+        ])
+    dept.managerId = manager_ids[0] if manager_ids else None
+    dept.managerIds = ','.join(manager_ids) if manager_ids else None
+
+# ------------------ ROLLUPS ------------------
+
+ROLLUP_INSERT_CHUNK = 5000
+
+
+def rollup_rows(project_ids=None, conn=None):
+    # Monthly revenue/cost per project with every assignment spread over the
+    # working days of its span (see prorate_utils); year/month 0 holds
+    # assignments without a start date. Reads through conn when given.
+    stmt = select(
+        ProjectAssignment.project_id,
+        Project.departmentId,
+        ProjectAssignment.start_date,
+        ProjectAssignment.end_date,
+        ProjectAssignment.cost,
+        ProjectAssignment.actual_cost
+    ).join(Project, Project.id == ProjectAssignment.project_id)
+    if project_ids is not None:
+        stmt = stmt.where(ProjectAssignment.project_id.in_(project_ids))
+    rows = (conn or db.session).execute(stmt).all()
+    if not rows:
+        return []
+
+    project_ids, department_ids, starts, ends, costs, actual_costs = zip(*rows)
+    departments = dict(zip(project_ids, department_ids))
+    keys, years, months, sums = prorate_by_month(
+        project_ids, to_days(starts), to_days(ends),
+        np.array([costs, actual_costs], dtype=np.float64).T,
+        holidays=all_holidays()
+    )
+    return [
+        {
+            "project_id": project_id,
+            "year": year,
+            "month": month,
+            "department_id": departments[project_id],
+            "revenue": revenue,
+            "actual_cost": actual_cost,
+            "margin": revenue - actual_cost,
+        }
+        for project_id, year, month, (revenue, actual_cost)
+        in zip(keys.tolist(), years.tolist(), months.tolist(), sums.tolist())
+    ]
+
+
+def _insert_rollup_rows(project_ids=None, conn=None):
+    rows = rollup_rows(project_ids, conn)
+    for i in range(0, len(rows), ROLLUP_INSERT_CHUNK):
+        (conn or db.session).execute(db.insert(ProjectMonthlyRollup), rows[i:i + ROLLUP_INSERT_CHUNK])
+
+
+def _financials_select(project_ids=None):
+    assignments = (
+        select(
+            ProjectAssignment.project_id.label("project_id"),
+            func.sum(ProjectAssignment.cost).label("total_cost"),
+            func.sum(ProjectAssignment.actual_cost).label("actual_cost"),
+            func.count(ProjectAssignment.id).label("assignment_count")
+        )
+        .group_by(ProjectAssignment.project_id)
+        .subquery()
+    )
+    assignees = (
+        select(
+            project_assignees.c.project_id.label("project_id"),
+            func.count().label("assignee_count")
+        )
+        .group_by(project_assignees.c.project_id)
+        .subquery()
+    )
+    total_cost = func.coalesce(assignments.c.total_cost, 0)
+    actual_cost = func.coalesce(assignments.c.actual_cost, 0)
+
+    stmt = (
+        select(
+            Project.id,
+            total_cost,
+            actual_cost,
+            total_cost - actual_cost,
+            func.coalesce(assignments.c.assignment_count, 0),
+            func.coalesce(assignees.c.assignee_count, 0),
+            func.now()
+        )
+        .outerjoin(assignments, assignments.c.project_id == Project.id)
+        .outerjoin(assignees, assignees.c.project_id == Project.id)
+    )
+    if project_ids is not None:
+        stmt = stmt.where(Project.id.in_(project_ids))
+    return stmt
+
+
+_FINANCIALS_COLUMNS = ['project_id', 'total_cost', 'actual_cost', 'margin',
+                       'assignment_count', 'assignee_count', 'updated_at']
+
+
+def project_financials_query(*columns):
+    # Shared read path for budget endpoints: project columns plus their precomputed
+    # totals. Projects without a project_financials row read as zero.
+    return db.session.query(
+        *columns,
+        func.coalesce(ProjectFinancials.total_cost, 0).label("total_cost"),
+        func.coalesce(ProjectFinancials.actual_cost, 0).label("actual_cost"),
+        func.coalesce(ProjectFinancials.margin, 0).label("margin"),
+        func.coalesce(ProjectFinancials.assignee_count, 0).label("assignee_count")
+    ).outerjoin(ProjectFinancials, Project.id == ProjectFinancials.project_id)
+
+
+def refresh_project_aggregates(project_ids):
+    # Recompute the rollup and financials rows of the given projects inside the
+    # caller's transaction.
+    project_ids = {int(pid) for pid in project_ids if pid is not None}
+    if not project_ids:
+        return
+
+    db.session.flush()
+    db.session.execute(
+        db.delete(ProjectMonthlyRollup).where(ProjectMonthlyRollup.project_id.in_(project_ids))
+    )
+    _insert_rollup_rows(project_ids)
+    db.session.execute(
+        db.delete(ProjectFinancials).where(ProjectFinancials.project_id.in_(project_ids))
+    )
+    db.session.execute(
+        db.insert(ProjectFinancials).from_select(_FINANCIALS_COLUMNS, _financials_select(project_ids))
+    )
+
+
+def _rebuild_project_aggregates(conn=None):
+    executor = conn or db.session
+    executor.execute(db.delete(ProjectMonthlyRollup))
+    _insert_rollup_rows(conn=conn)
+    executor.execute(db.delete(ProjectFinancials))
+    executor.execute(
+        db.insert(ProjectFinancials).from_select(_FINANCIALS_COLUMNS, _financials_select())
+    )
+
+
+def rebuild_project_aggregates():
+    _rebuild_project_aggregates()
+    db.session.commit()
+
+
+@migrations.migration(7, "Backfill project_monthly_rollup and project_financials")
+def backfill_project_aggregates(conn):
+    # create_all adds both tables empty on an existing database, and the
+    # budget/report endpoints read only them; fill them once at upgrade
+    _rebuild_project_aggregates(conn)
+
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    rebuild_project_aggregates()
+    print(f"✅ Rebuilt {ProjectMonthlyRollup.query.count()} rollup rows "
+          f"and {ProjectFinancials.query.count()} project financials rows")
 
 # ------------------ BASIC TEST ROUTE ------------------
 
@@ -164,6 +649,8 @@ def home():
 # ------------------ FINANCIAL YEARS ------------------
 
 @app.route("/financial-years", methods=["GET"])
+@conditional("financial_year")
+@cached("financial_year")
 def get_financial_years():
     years = FinancialYear.query.all()
     return jsonify([year.to_dict() for year in years]), 200
@@ -196,39 +683,110 @@ def delete_financial_year(id):
     db.session.commit()
     return jsonify({"message": "Deleted"}), 200
 #------------------FINANCIAL YEAR PAGE-----------------
+def employee_financials_query(year, search=None, did=None, roles=("employee", "department_manager")):
+    # Join each user to their financials for the requested year in one query.
+    # Without a year, fall back to the user's latest financial year.
+    if year:
+        fin_join = and_(
+            EmployeeFinancials.eid == User.eid,
+            EmployeeFinancials.financial_year == year
+        )
+    else:
+        latest = (
+            db.session.query(
+                EmployeeFinancials.eid.label("eid"),
+                func.max(EmployeeFinancials.financial_year).label("financial_year")
+            )
+            .group_by(EmployeeFinancials.eid)
+            .subquery()
+        )
+        fin_join = and_(
+            EmployeeFinancials.eid == User.eid,
+            EmployeeFinancials.eid == latest.c.eid,
+            EmployeeFinancials.financial_year == latest.c.financial_year
+        )
+
+    query = db.session.query(
+        User.eid,
+        User.fname,
+        User.lname,
+        EmployeeFinancials.salary,
+        EmployeeFinancials.infrastructure
+    )
+    if not year:
+        query = query.outerjoin(latest, latest.c.eid == User.eid)
+    query = query.outerjoin(EmployeeFinancials, fin_join).filter(
+        User.role.in_(roles),
+        User.status == 'active'
+    )
+
+    if did:
+        query = query.filter(User.did == did)
+    if search:
+        query = query.filter(db.or_(
+            func.lower(User.eid).like(f'{search}%'),
+            func.lower(User.fname).like(f'{search}%'),
+            func.lower(User.lname).like(f'{search}%')
+        ))
+
+    return query.order_by(User.eid)
+
+
 @app.route('/api/employee-financials', methods=['GET'])
 @jwt_required()
 def get_employee_financials():
     year = request.args.get("year")  # read year from query param
-
-    users = User.query.filter(
-        User.role.in_(['employee', 'department_manager']),
-        User.status == 'active'
-    ).all()
-
-    result = []
-    for user in users:
-        query = EmployeeFinancials.query.filter_by(eid=user.eid)
-        if year:
-            query = query.filter_by(financial_year=year)
-
-        financial = query.first()
-        salary = financial.salary if financial else None
-        infrastructure = financial.infrastructure if financial else None
+    search = request.args.get("q", "").strip().lower()
+    did = request.args.get("did")
+    roles = ['employee', 'department_manager']
+    if request.args.get("role"):
+        roles = [r for r in roles if r == request.args.get("role")]
+    page = request.args.get("page", type=int)
+    limit = request.args.get("limit", type=int)
+
+    query = employee_financials_query(year, search, did, roles)
+
+    total = None
+    if page or limit:
+        page = max(page or 1, 1)
+        limit = min(max(limit or 50, 1), 500)
+        total = query.order_by(None).count()
+        query = query.offset((page - 1) * limit).limit(limit)
+
+    def financials_json(row):
+        eid, fname, lname, salary, infrastructure = row
         cost = None
         if salary is not None and infrastructure is not None:
             cost = salary + infrastructure
-        result.append({
-            "eid": user.eid,
-            "fname": user.fname,
-            "lname": user.lname,
+        return {
+            "eid": eid,
+            "fname": fname,
+            "lname": lname,
             "salary": salary,
             "infrastructure": infrastructure,
             "cost": cost
-        })
+        }
+
+    if total is None:
+        rows = stream_query(query) if wants_stream() else query.all()
+        return list_response(financials_json(row) for row in rows)
+
+    return jsonify({
+        "items": [financials_json(row) for row in query.all()],
+        "page": page,
+        "limit": limit,
+        "total": total
+    }), 200
+
+
+# Monthly salary + infrastructure spread over 22 working days of 8 hours
+MONTHLY_HOURS = 176
 
-    return jsonify(result), 200
 
+def hourly_cost(salary, infrastructure):
+    if salary is None or infrastructure is None:
+        return None
+    return (salary + infrastructure) / MONTHLY_HOURS
 
 
 # POST to update a user's financials
@@ -254,75 +812,194 @@ def update_employee_financials(eid):
 
     financial.salary = salary
     financial.infrastructure = infrastructure
-    financial.hourly_cost = (salary + infrastructure) / 176 if salary is not None and infrastructure is not None else None
+    financial.hourly_cost = hourly_cost(salary, infrastructure)
 
     db.session.commit()
 
     return jsonify({"message": "Financial data updated"}), 200
 
+# ------------------ EMPLOYEE FINANCIALS IMPORT ------------------
+
+FINANCIALS_IMPORT_COLUMNS = ("eid", "financial_year", "salary", "infrastructure")
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "2000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+
+def import_employee_financials(rows):
+    # rows: (line, {column: value}) from import_utils.read_rows. Each chunk is
+    # validated with one User lookup and written with one upsert, committed on
+    # its own; bad rows are reported and skipped instead of failing the file.
+    known_years = {label for (label,) in db.session.query(FinancialYear.label)}
+    report = {"rows": 0, "upserted": 0, "failed": 0, "errors": []}
+
+    def reject(line, eid, message):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": line, "eid": eid or None, "error": message})
+
+    try:
+        for chunk in batched(rows, IMPORT_CHUNK_SIZE):
+            _import_financials_chunk(chunk, known_years, report, reject)
+    except ImportFormatError as e:
+        if not report["rows"]:
+            raise
+        # Earlier chunks are already committed; say where the file went bad
+        report["error"] = f"{e}; rows after the first {report['rows']} were not imported"
+
+    report["errors"].sort(key=lambda error: error["row"])
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
+
+
+def _import_financials_chunk(chunk, known_years, report, reject):
+    parsed = {}
+    for line, values in chunk:
+        report["rows"] += 1
+        eid = str(values.get("eid") or "").strip()
+        financial_year = str(values.get("financial_year") or "").strip()
+        if not eid or not financial_year:
+            reject(line, eid, "eid and financial_year are required")
+            continue
+        if known_years and financial_year not in known_years:
+            reject(line, eid, f"Unknown financial year '{financial_year}'")
+            continue
+        try:
+            salary = parse_number(values.get("salary"))
+            infrastructure = parse_number(values.get("infrastructure"))
+        except ValueError:
+            reject(line, eid, "salary and infrastructure must be numbers")
+            continue
+        if any(v is not None and (not math.isfinite(v) or v < 0) for v in (salary, infrastructure)):
+            reject(line, eid, "salary and infrastructure must be non-negative numbers")
+            continue
+        # A later row for the same employee and year replaces an earlier one
+        parsed[(eid, financial_year)] = (line, salary, infrastructure)
+
+    if not parsed:
+        return
+    known_eids = set(db.session.scalars(
+        select(User.eid).where(User.eid.in_({eid for eid, _ in parsed}))
+    ))
+
+    now = datetime.utcnow()
+    values, lines = [], []
+    for (eid, financial_year), (line, salary, infrastructure) in parsed.items():
+        if eid not in known_eids:
+            reject(line, eid, "User not found")
+            continue
+        values.append({
+            "eid": eid,
+            "financial_year": financial_year,
+            "salary": salary,
+            "infrastructure": infrastructure,
+            "hourly_cost": hourly_cost(salary, infrastructure),
+            "created_at": now,
+            "updated_at": now,
+        })
+        lines.append((line, eid))
+    if not values:
+        return
+
+    upsert = mysql_insert(EmployeeFinancials).values(values)
+    upsert = upsert.on_duplicate_key_update(
+        salary=upsert.inserted.salary,
+        infrastructure=upsert.inserted.infrastructure,
+        hourly_cost=upsert.inserted.hourly_cost,
+        updated_at=upsert.inserted.updated_at,
+    )
+    try:
+        db.session.execute(upsert)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("employee-financials import: chunk of %d rows failed", len(values))
+        for line, eid in lines:
+            reject(line, eid, "Database error")
+        return
+    report["upserted"] += len(values)
+
+
+@app.route('/api/employee-financials/import', methods=['POST'])
+@jwt_required()
+def import_employee_financials_route():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Upload a CSV or XLSX file in the 'file' field"}), 400
+
+    try:
+        report = import_employee_financials(
+            read_rows(upload.stream, upload.filename, FINANCIALS_IMPORT_COLUMNS)
+        )
+    except ImportFormatError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
+    logger.info("employee-financials import: %d rows, %d upserted, %d failed",
+                report["rows"], report["upserted"], report["failed"])
+    return jsonify(report), 200
+
+
+@app.cli.command("import-financials")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def import_financials_command(path):
+    with open(path, "rb") as f:
+        try:
+            report = import_employee_financials(read_rows(f, path, FINANCIALS_IMPORT_COLUMNS))
+        except ImportFormatError as e:
+            raise click.ClickException(str(e))
+    print(f"✅ Imported {report['upserted']} of {report['rows']} rows from {path}")
+    for error in report["errors"]:
+        print(f"   row {error['row']}: {error['error']}")
+    if report["errors_truncated"]:
+        print(f"   ... {report['failed'] - len(report['errors'])} more errors")
+
 # ------------------ PROJECT ASSIGNMENTS ------------------
 
-def working_days(start_date, end_date): 
-    total = 0
-    curr = start_date
-    while curr <= end_date:
-        if curr.weekday() < 5:  # 0–4 are Mon–Fri
-            total += 1
-        curr += timedelta(days=1)
-    return total
+
+def hourly_costs_query(eids, financial_years):
+    return db.session.query(
+        EmployeeFinancials.eid,
+        EmployeeFinancials.financial_year,
+        EmployeeFinancials.hourly_cost
+    ).filter(
+        EmployeeFinancials.eid.in_(eids),
+        EmployeeFinancials.financial_year.in_(financial_years)
+    )
+
 @app.route('/api/assign-task', methods=['POST'])
 @jwt_required()
 def assign_task():
-    from datetime import datetime, timedelta
-
-    def working_days(start_date, end_date):
-        day_count = 0
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date.weekday() < 5:
-                day_count += 1
-            current_date += timedelta(days=1)
-        return day_count
-
     try:
-        print("📥 Received request to /api/assign-task")
         data = request.get_json()
-        print(f"🔍 Request JSON: {data}")
 
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        project_id = data.get('project_id')
+        default_project_id = data.get('project_id')
         assignments = data.get('assignments', [])
 
-        print(f"📌 project_id: {project_id}, Assignments count: {len(assignments)}")
-
-        if project_id is None:
-            return jsonify({"error": "project_id is required"}), 400
-
-        try:
-            project_id = int(project_id)
-        except (ValueError, TypeError):
-            return jsonify({"error": "project_id must be an integer"}), 400
+        logger.debug("assign-task: project_id=%s assignments=%d", default_project_id,
+                     len(assignments) if isinstance(assignments, list) else 0)
 
         if not assignments or not isinstance(assignments, list):
             return jsonify({"error": "Assignments must be a non-empty array"}), 400
 
-        project = Project.query.get(project_id)
-        if not project:
-            print(f"🚫 Project {project_id} not found.")
-            return jsonify({"error": "Project not found"}), 404
-
-        validated_assignments = []
-        total_percentage = 0
-        allocations = []
-
+        # 1️⃣ Parse and validate the payload without touching the DB.
+        # Each assignment may carry its own project_id so one batch can span projects.
+        parsed = []
         for assignment in assignments:
-            print(f"🧪 Validating assignment: {assignment}")
-
             if not all(key in assignment for key in ['user_id', 'percentage', 'billing_rate', 'start_date', 'end_date']):
                 return jsonify({"error": "Each assignment requires user_id, percentage, billing_rate, start_date, and end_date"}), 400
 
+            project_id = assignment.get('project_id', default_project_id)
+            if project_id is None:
+                return jsonify({"error": "project_id is required"}), 400
+
+            try:
+                project_id = int(project_id)
+            except (ValueError, TypeError):
+                return jsonify({"error": "project_id must be an integer"}), 400
+
             try:
                 user_id = int(assignment['user_id'])
                 percentage = float(assignment['percentage'])
@@ -332,119 +1009,127 @@ def assign_task():
             except (ValueError, TypeError):
                 return jsonify({"error": "Invalid numeric or date values in assignment. Date format: YYYY-MM-DD"}), 400
 
-            user = User.query.get(user_id)
-            if not user:
-                print(f"🚫 User with ID {user_id} not found.")
-                return jsonify({"error": f"User with ID {user_id} not found"}), 404
-
             if percentage <= 0 or percentage > 100:
                 return jsonify({"error": "Percentage must be between 0 and 100"}), 400
 
-            working_days_count = working_days(start_date, end_date)
-            HOURS_PER_DAY = 8
-            allocated_hours = working_days_count * HOURS_PER_DAY * (percentage / 100.0)
-            cost = billing_rate * allocated_hours
+            parsed.append({
+                'project_id': project_id,
+                'user_id': user_id,
+                'percentage': percentage,
+                'billing_rate': billing_rate,
+                'start_date': start_date,
+                'end_date': end_date
+            })
 
-            # 🔁 Actual Cost Calculation (from employee_financials)
-            fy_start = start_date.year if start_date.month >= 4 else start_date.year - 1
-            financial_year = f"{fy_start}-{fy_start + 1}"
-            eid = user.eid
+        # 2️⃣ Prefetch projects, users and financials with one IN query each
+        project_ids = {a['project_id'] for a in parsed}
+        found_projects = {
+            pid for (pid,) in db.session.query(Project.id).filter(Project.id.in_(project_ids))
+        }
+        for pid in sorted(project_ids - found_projects):
+            logger.info("assign-task: project %s not found", pid)
+            return jsonify({"error": "Project not found", "project_id": pid}), 404
 
-            emp_fin = db.session.execute(
-                db.select(EmployeeFinancials).where(
-                    EmployeeFinancials.eid == eid,
-                    EmployeeFinancials.financial_year == financial_year
-                )
-            ).scalar_one_or_none()
+        user_ids = {a['user_id'] for a in parsed}
+        user_eids = dict(
+            db.session.query(User.id, User.eid).filter(User.id.in_(user_ids)).all()
+        )
+        for uid in sorted(user_ids - user_eids.keys()):
+            logger.info("assign-task: user %s not found", uid)
+            return jsonify({"error": f"User with ID {uid} not found"}), 404
+
+        def financial_year_of(day):
+            fy_start = day.year if day.month >= 4 else day.year - 1
+            return f"{fy_start}-{fy_start + 1}"
+
+        fin_years = {financial_year_of(a['start_date']) for a in parsed}
+        hourly_costs = {
+            (eid, fy): hourly_cost
+            for eid, fy, hourly_cost in hourly_costs_query(set(user_eids.values()), fin_years)
+        }
 
-            if not emp_fin:
-                return jsonify({"error": f"No hourly cost found for {eid} in FY {financial_year}"}), 404
+        # 3️⃣ Compute hours and costs for the whole batch
+        hours = working_hours_many(
+            (a['start_date'], a['end_date'], a['percentage']) for a in parsed
+        )
 
-            actual_cost = round(emp_fin.hourly_cost * allocated_hours, 2)
+        allocations = []
+        project_totals = {}
+        for a, allocated_hours in zip(parsed, hours):
+            eid = user_eids[a['user_id']]
+            financial_year = financial_year_of(a['start_date'])
+            hourly_cost = hourly_costs.get((eid, financial_year))
+            if hourly_cost is None:
+                return jsonify({"error": f"No hourly cost found for {eid} in FY {financial_year}"}), 404
 
-            allocation_data = {
-                'user_id': user_id,
-                'project_id': project_id,
-                'allocated_percentage': percentage,
-                'billing_rate': billing_rate,
+            allocations.append({
+                'user_id': a['user_id'],
+                'project_id': a['project_id'],
+                'allocated_percentage': a['percentage'],
+                'billing_rate': a['billing_rate'],
                 'allocated_hours': allocated_hours,
-                'cost': round(cost, 2),
-                'start_date': start_date,
-                'end_date': end_date,
-                'actual_cost': actual_cost
-            }
-
-            total_percentage += percentage
-            allocations.append(allocation_data)
-            validated_assignments.append(allocation_data)
-
-        if total_percentage > 100:
-            print(f"⚠ Total percentage exceeds 100%: {total_percentage}")
-            return jsonify({
-                "error": f"Total percentage exceeds 100% (current: {total_percentage}%)",
-                "total_percentage": total_percentage
-            }), 400
-
-        for assignment in validated_assignments:
-            existing = ProjectAssignment.query.filter_by(
-                user_id=assignment['user_id'],
-                project_id=project_id
-            ).first()
-
-            if existing:
-                print(f"✏ Updating existing assignment for {assignment['user_id']}")
-                existing.allocated_percentage = assignment['allocated_percentage']
-                existing.allocated_hours = assignment['allocated_hours']
-                existing.billing_rate = assignment['billing_rate']
-                existing.cost = assignment['cost']
-                existing.start_date = assignment['start_date']
-                existing.end_date = assignment['end_date']
-                existing.actual_cost = assignment['actual_cost']
-            else:
-                print(f"➕ Creating new assignment for {assignment['user_id']}")
-                new_assignment = ProjectAssignment(**assignment)
-                db.session.add(new_assignment)
+                'cost': round(a['billing_rate'] * allocated_hours, 2),
+                'start_date': a['start_date'],
+                'end_date': a['end_date'],
+                'actual_cost': round(hourly_cost * allocated_hours, 2)
+            })
+            project_totals[a['project_id']] = project_totals.get(a['project_id'], 0) + a['percentage']
+
+        for pid, project_total in project_totals.items():
+            if project_total > 100:
+                logger.info("assign-task: allocation for project %s would be %s%%", pid, project_total)
+                return jsonify({
+                    "error": f"Total percentage exceeds 100% (current: {project_total}%)",
+                    "project_id": pid,
+                    "total_percentage": project_total
+                }), 400
+
+        # 4️⃣ Write everything with two multi-row upserts
+        now = datetime.utcnow()
+        upsert = mysql_insert(ProjectAssignment).values(allocations)
+        upsert = upsert.on_duplicate_key_update(
+            allocated_percentage=upsert.inserted.allocated_percentage,
+            allocated_hours=upsert.inserted.allocated_hours,
+            billing_rate=upsert.inserted.billing_rate,
+            cost=upsert.inserted.cost,
+            start_date=upsert.inserted.start_date,
+            end_date=upsert.inserted.end_date,
+            actual_cost=upsert.inserted.actual_cost,
+            updated_at=now
+        )
+        db.session.execute(upsert)
 
-            assignee_exists = db.session.execute(
-                db.select(project_assignees).where(
-                    project_assignees.c.project_id == project_id,
-                    project_assignees.c.user_id == assignment['user_id']
-                )
-            ).first()
-
-            if not assignee_exists:
-                print(f"📌 Linking user {assignment['user_id']} to project {project_id} in project_assignees")
-                db.session.execute(
-                    project_assignees.insert().values(
-                        project_id=project_id,
-                        user_id=assignment['user_id']
-                    )
-                )
+        # Link users to projects, keeping any role already on the link
+        link = mysql_insert(project_assignees).values([
+            {'project_id': a['project_id'], 'user_id': a['user_id']} for a in allocations
+        ])
+        link = link.on_duplicate_key_update(role=project_assignees.c.role)
+        db.session.execute(link)
 
+        refresh_project_aggregates(project_totals.keys())
         db.session.commit()
-        print("✅ Assignments committed to DB")
 
         return jsonify({
             "message": "Tasks assigned successfully",
             "allocations": allocations,
-            "total_percentage": total_percentage
+            "total_percentage": sum(project_totals.values()),
+            "project_totals": project_totals
         }), 200
 
-    except SQLAlchemyError as e:
+    except SQLAlchemyError:
         db.session.rollback()
-        print(f"❌ Database error: {str(e)}")
+        logger.exception("assign-task: database error")
         return jsonify({"error": "Database operation failed"}), 500
 
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"❗ Unexpected error: {str(e)}")
+        logger.exception("assign-task failed")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
 @app.route('/api/projects/<int:project_id>/assignees/<eid>', methods=['DELETE'])
 @jwt_required()
 def remove_task_assignment(project_id, eid):
     try:
-        print(f"🗑 Removing assignment: project_id={project_id}, eid={eid}")
 
         user = User.query.filter_by(eid=eid).first()
         if not user:
@@ -458,7 +1143,6 @@ def remove_task_assignment(project_id, eid):
 
         if assignment:
             db.session.delete(assignment)
-            print(f"🗑 Deleted from ProjectAssignment for user_id={user.id}")
 
         # Remove from project_assignees join table
         db.session.execute(
@@ -467,20 +1151,20 @@ def remove_task_assignment(project_id, eid):
                 project_assignees.c.user_id == user.id
             )
         )
-        print(f"🧹 Removed from project_assignees for user_id={user.id}")
 
+        refresh_project_aggregates([project_id])
         db.session.commit()
-        print("✅ Assignment and assignee link deleted")
+        logger.info("Removed assignment of %s from project %s", eid, project_id)
         return jsonify({"message": "Assignment removed successfully"}), 200
 
-    except SQLAlchemyError as e:
+    except SQLAlchemyError:
         db.session.rollback()
-        print(f"❌ DB error: {str(e)}")
+        logger.exception("remove-assignment: database error")
         return jsonify({"error": "Failed to remove assignment"}), 500
 
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"❗ Unexpected error: {str(e)}")
+        logger.exception("remove-assignment failed")
         return jsonify({"error": "Unexpected error"}), 500
 
 
@@ -488,19 +1172,18 @@ def remove_task_assignment(project_id, eid):
 # ------------------ HELPERS ------------------
 
 
+def _write_activity_rows(rows):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(ActivityLog.__table__.insert(), rows)
+
+
+# Activity events are spooled locally and written in batches off the request path
+activity_writer = ActivityWriter(_write_activity_rows)
+
+
 def log_activity(entity_type, entity_name, action):
-    try:
-        new_log = ActivityLog(
-            type=entity_type,
-            name=entity_name,
-            action=action,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(new_log)
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Failed to log activity: {str(e)}")
+    activity_writer.add(type=entity_type, name=entity_name, action=action, timestamp=datetime.utcnow())
 
 
 def user_to_json(u):
@@ -517,24 +1200,174 @@ def user_to_json(u):
         "createdAt": u.createdAt.isoformat() if u.createdAt else None,
         "updatedAt": u.updatedAt.isoformat() if u.updatedAt else None
     }
+
+
+def project_to_json(p):
+    return {
+        "id": p.id,
+        "name": p.name,
+        "departmentId": p.departmentId,
+        "startDate": p.startDate.strftime('%Y-%m-%d'),
+        "endDate": p.endDate.strftime('%Y-%m-%d'),
+        #"budget": p.budget,
+        "createdAt": p.createdAt.isoformat() if p.createdAt else None,
+        "updatedAt": p.updatedAt.isoformat() if p.updatedAt else None
+    }
+
+
+# Keyset pagination: ?limit=&cursor=&sort=[-]field plus the filters below.
+# Without limit/cursor the endpoints keep returning a plain array.
+USER_SORTS = {"id": User.id, "eid": User.eid, "fname": User.fname, "lname": User.lname,
+              "joinDate": User.joinDate, "createdAt": User.createdAt}
+USER_FILTERS = {"department": User.did, "status": User.status, "role": User.role}
+PROJECT_SORTS = {"id": Project.id, "name": Project.name, "startDate": Project.startDate,
+                 "endDate": Project.endDate, "createdAt": Project.createdAt}
+PROJECT_FILTERS = {"department": Project.departmentId}
+ACTIVITY_SORTS = {"timestamp": ActivityLog.timestamp}
+ACTIVITY_FILTERS = {"entity": ActivityLog.type, "action": ActivityLog.action}
+
+
+# ?stream=1 on an unpaged list sends the same JSON array incrementally,
+# reading STREAM_CHUNK_SIZE rows at a time from a server-side cursor
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+
+
+def wants_stream():
+    return request.args.get("stream") == "1"
+
+
+def stream_query(query):
+    # Execute now, while use_bind still applies and errors can still become a
+    # 500, then hand the server-side cursor to the response generator; rows
+    # are counted for the metrics as they are read
+    return metrics.count_rows(iter(query.yield_per(STREAM_CHUNK_SIZE)))
+
+
+def _compact_dumps(obj):
+    return app.json.dumps(obj, separators=(",", ":"))
+
+
+def list_response(items, next_cursor=None, paged=False):
+    if paged:
+        return jsonify({"items": list(items), "next_cursor": next_cursor})
+    if wants_stream():
+        return json_array_response(items, _compact_dumps)
+    return jsonify(list(items))
+
+
+@app.errorhandler(PaginationError)
+def handle_pagination_error(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.errorhandler(PasswordBusy)
+def handle_password_busy(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
 # ------------------ AUTH ------------------
 
+# Access tokens carry the identity claims role-gated routes need, so they can
+# authorize without loading the user. Changing any of TOKEN_FIELDS bumps
+# User.token_version; older tokens are then rejected and the client calls
+# /api/token/refresh (the frontend does this on a 401, see tokenRefresh.js).
+# The current version per user is cached for TOKEN_VERSION_TTL seconds in the
+# response cache, or per process when it is disabled (other processes see a
+# bump within that window).
+CLAIMS_VERSION = 2
+TOKEN_FIELDS = ("eid", "role", "did", "status")
+TOKEN_VERSION_TTL = int(os.getenv("TOKEN_VERSION_TTL", "60"))
+token_versions = response_cache if response_cache.enabled else cache_utils.ResponseCache(cache_utils.MemoryBackend(10000))
+
+
+def is_project_manager_stmt(user_id):
+    return select(exists().where(
+        project_assignees.c.user_id == user_id,
+        project_assignees.c.role == 'Project Manager'
+    ))
+
+
+def user_claims(user):
+    is_pm = db.session.execute(is_project_manager_stmt(user.id)).scalar()
+    return {
+        "ver": CLAIMS_VERSION,
+        "id": user.id,
+        "eid": user.eid,
+        "role": user.role,
+        "did": user.did,
+        "email": user.email,
+        "is_pm": bool(is_pm),
+        "tv": user.token_version or 0
+    }
+
+
+def current_user_claims():
+    # Claims of the caller; tokens issued before claims were versioned fall
+    # back to one primary-key lookup.
+    claims = get_jwt()
+    if claims.get("ver") == CLAIMS_VERSION:
+        return claims
+    user = db.session.get(User, int(get_jwt_identity()))
+    return user_claims(user) if user else None
+
+
+def _token_version(user_id):
+    key = f"token_version:{user_id}"
+    version = token_versions.get(key)
+    if version is not None:
+        return version
+    version = db.session.execute(select(User.token_version).where(User.id == user_id)).scalar()
+    version = -1 if version is None else version  # -1: user deleted
+    token_versions.set(key, version, TOKEN_VERSION_TTL)
+    return version
+
+
+@jwt.token_in_blocklist_loader
+def _token_revoked(jwt_header, jwt_payload):
+    if request.endpoint == 'refresh_token':
+        return False
+    version = _token_version(jwt_payload["sub"])
+    return version < 0 or jwt_payload.get("tv", 0) < version
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_token_versions(session, flush_context, instances):
+    revoked = session.info.setdefault('revoked_users', {})
+    for obj in session.dirty:
+        if isinstance(obj, User) and any(db.inspect(obj).attrs[f].history.has_changes() for f in TOKEN_FIELDS):
+            obj.token_version = (obj.token_version or 0) + 1
+            revoked[obj.id] = obj.token_version
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            revoked[obj.id] = -1
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_token_versions(session):
+    revoked = session.info.pop('revoked_users', None)
+    for user_id, version in (revoked or {}).items():
+        token_versions.set(f"token_version:{user_id}", version, TOKEN_VERSION_TTL)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_token_versions(session):
+    session.info.pop('revoked_users', None)
+
+
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.json
+    password = data.get("password")
     user = User.query.filter_by(email=data.get("email")).first()
-    if not user or not check_password_hash(user.password, data.get("password")):
+    if not user or not verify_password(user.password, password):
         return jsonify({"error": "Invalid email or password"}), 401
 
-    token = generate_token(user)
-
-    # Check if the user is a project manager in the assignments table
-    stmt = select(project_assignees).where(project_assignees.c.user_id == user.id)
-    pa_results = db.session.execute(stmt).fetchall()
-
-    # Set role to 'Project Manager' if any assignment has that role
-    pa_role = 'Project Manager' if any(row.role == 'Project Manager' for row in pa_results) else None
+    # Upgrade hashes made with older parameters while we have the plain password
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
 
+    claims = user_claims(user)
+    token = generate_token(user, claims)
+    pa_role = 'Project Manager' if claims["is_pm"] else None
 
     return jsonify({
         "user": {
@@ -548,11 +1381,31 @@ def login():
     })
 
 
+# Re-issue a token with current claims, e.g. after a role change revoked the old one
+@app.route('/api/token/refresh', methods=['POST'])
+@jwt_required()
+def refresh_token():
+    user = db.session.get(User, int(get_jwt_identity()))
+    if not user or user.status == 'inactive':
+        return jsonify({"error": "User not found"}), 401
+
+    claims = user_claims(user)
+    return jsonify({
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "role": user.role,
+            "pa_role": 'Project Manager' if claims["is_pm"] else None
+        },
+        "userName": user.fname,
+        "token": generate_token(user, claims)
+    })
+
+
 @app.route('/api/admin/signup', methods=['POST'])
 def admin_signup():
     try:
         data = request.get_json()
-        print("Received data:", data)
 
         fname = data.get("name")
         email = data.get("email")
@@ -578,7 +1431,7 @@ def admin_signup():
             lname = " "
 
         # Hash the password
-        hashed_pw = generate_password_hash(password)
+        hashed_pw = hash_password(password)
 
         # Create new user
         new_user = User(
@@ -597,14 +1450,16 @@ def admin_signup():
 
         return jsonify({"message": "Admin created successfully", "eid": eid}), 201
 
-    except Exception as e:
-        print("Error in admin signup route:", str(e))
+    except Exception:
+        logger.exception("admin-signup failed")
         return jsonify({"error": "Internal server error"}), 500
     
 # ------------------ Project Manager ------------------
 
 @app.route('/api/my-projects', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_my_projects():
     user_id = get_jwt_identity()
 
@@ -619,23 +1474,7 @@ def get_my_projects():
     project_ids = [row[0] for row in results]
 
     # Get project details with total cost
-    project_data = (
-        db.session.query(
-            Project.id,
-            Project.name,
-            Project.departmentId,
-            Project.startDate,
-            Project.endDate,
-            Project.createdAt,
-            Project.updatedAt,
-            func.coalesce(func.sum(ProjectAssignment.cost), 0).label("total_cost"),
-            func.coalesce(func.sum(ProjectAssignment.actual_cost), 0).label("actual_cost")
-        )
-        .outerjoin(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-        .filter(Project.id.in_(project_ids))
-        .group_by(Project.id)
-        .all()
-    )
+    project_data = projects_summary_query().filter(Project.id.in_(project_ids)).all()
 
     # Format and return
     return jsonify([
@@ -654,6 +1493,8 @@ def get_my_projects():
 
 @app.route('/api/pm-project-budgets', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_pm_project_budgets():
     current_user_id = get_jwt_identity()
 
@@ -669,28 +1510,22 @@ def get_pm_project_budgets():
     if not project_ids:
         return jsonify([]), 200
 
-    # Step 2: Query project summaries (revenue, cost, margin)
+    # Step 2: Read project summaries (revenue, cost, margin)
     results = (
-        db.session.query(
-            Project.name,
-            func.coalesce(func.sum(ProjectAssignment.cost), 0).label("revenue"),
-            func.coalesce(func.sum(ProjectAssignment.actual_cost), 0).label("actual_cost")
-        )
-        .join(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-        .filter(Project.id.in_(project_ids))
-        .group_by(Project.name)
+        project_financials_query(Project.name)
+        .filter(Project.id.in_(project_ids), ProjectFinancials.assignment_count > 0)
         .all()
     )
 
     # Step 3: Format and return the result
     return jsonify([
         {
-            "name": name,
-            "cost": float(revenue),          # revenue is stored under 'cost' (frontend expects this)
-            "actual_cost": float(actual_cost),
-            "margin": float(revenue) - float(actual_cost)
+            "name": p.name,
+            "cost": float(p.total_cost),          # revenue is stored under 'cost' (frontend expects this)
+            "actual_cost": float(p.actual_cost),
+            "margin": float(p.margin)
         }
-        for name, revenue, actual_cost in results
+        for p in results
     ]), 200
 
 @app.route('/api/pm-my-projects', methods=['GET'])
@@ -720,14 +1555,12 @@ def g_projects():
 @app.route('/api/projects/<int:project_id>/pm-assignees/<eid>', methods=['DELETE'])
 @jwt_required()
 def remove_pm_assignee(project_id, eid):
-    print(f"[DELETE] Request to remove assignee EID={eid} from Project ID={project_id}")
 
     user = User.query.filter_by(eid=eid).first()
     if not user:
-        print(f"[ERROR] User with EID={eid} not found")
+        logger.info("remove-pm-assignee: user %s not found", eid)
         return jsonify({"error": "User not found"}), 404
 
-    print(f"[INFO] Found User ID={user.id} with EID={user.eid}")
 
     # 1️⃣ Check project_assignees table
     assignment = db.session.execute(
@@ -740,14 +1573,13 @@ def remove_pm_assignee(project_id, eid):
     ).first()
 
     if not assignment:
-        print(f"[ERROR] No assignment found for user {user.eid} in project {project_id}")
+        logger.info("remove-pm-assignee: %s is not assigned to project %s", eid, project_id)
         return jsonify({"error": "Assignee not found in project"}), 404
 
     role = assignment._mapping.get("role")
-    print(f"[INFO] Assignee role is '{role}'")
 
     if role == "Project Manager":
-        print("[BLOCKED] Cannot remove the Project Manager")
+        logger.info("remove-pm-assignee: refused to remove the project manager of project %s", project_id)
         return jsonify({"error": "Cannot remove the Project Manager from the project"}), 403
 
     # 2️⃣ Delete from project_assignees
@@ -760,20 +1592,142 @@ def remove_pm_assignee(project_id, eid):
         )
     )
 
-    # 3️⃣ Delete from project_assignment (task assignments)
-    db.session.execute(
-        db.delete(ProjectAssignment).where(
-            and_(
-                ProjectAssignment.project_id == project_id,
-                ProjectAssignment.user_id == user.id
-            )
-        )
-    )
+    # 3️⃣ Delete from project_assignment (task assignments)
+    db.session.execute(
+        db.delete(ProjectAssignment).where(
+            and_(
+                ProjectAssignment.project_id == project_id,
+                ProjectAssignment.user_id == user.id
+            )
+        )
+    )
+
+    refresh_project_aggregates([project_id])
+    db.session.commit()
+    logger.info("Removed assignee %s and their tasks from project %s", eid, project_id)
+    return jsonify({"message": "Assignee removed"}), 200
+
+
+# ------------------ SEARCH ------------------
+
+# In-process prefix/trigram index for the user picker. It is versioned by the
+# "user_search" row of table_version, which is bumped in the same transaction
+# as any write touching an indexed column (login rehashes, token_version and
+# updatedAt do not count). When another process has moved that version on,
+# the index is rebuilt in the background while searches keep using the old
+# one; commits made here are applied in place.
+user_search = UserSearchIndex()
+_user_search_lock = threading.Lock()
+SEARCH_MAX_LIMIT = 100
+SEARCH_MIN_TRIGRAM = 3  # shorter queries fall back to LIKE for substring matches
+USER_SEARCH_VERSION = "user_search"
+USER_SEARCH_COLUMNS = ("eid", "fname", "lname", "email", *(column.key for column in USER_FILTERS.values()))
+
+
+def _user_search_rows():
+    columns = [User.id, User.eid, User.fname, User.lname, User.email, *USER_FILTERS.values()]
+    for user_id, eid, fname, lname, email, *values in db.session.query(*columns):
+        yield user_id, eid, fname, lname, email, dict(zip(USER_FILTERS, values))
+
+
+def _rebuild_user_search():
+    # The version and the rows are read in the same transaction, so the index
+    # is tagged with the version it was actually built from
+    version = table_versions([USER_SEARCH_VERSION])[0]
+    user_search.rebuild(_user_search_rows(), version)
+
+
+def _rebuild_user_search_in_background():
+    def run():
+        try:
+            with app.app_context():
+                _rebuild_user_search()
+        except Exception:
+            logger.exception("user search index rebuild failed")
+        finally:
+            _user_search_lock.release()
+
+    if _user_search_lock.acquire(blocking=False):
+        threading.Thread(target=run, name="user-search-rebuild", daemon=True).start()
+
+
+def ensure_user_search_index():
+    # Only the very first build happens on the request path
+    if user_search.version is None:
+        with _user_search_lock:
+            if user_search.version is None:
+                _rebuild_user_search()
+    elif user_search.version < table_versions([USER_SEARCH_VERSION])[0]:
+        _rebuild_user_search_in_background()
+
+
+def _pending_user_changes(target):
+    session = object_session(target)
+    return session.info.setdefault('user_search', {}) if session is not None else {}
+
+
+def _queue_user_upsert(target):
+    attrs = {param: getattr(target, column.key) for param, column in USER_FILTERS.items()}
+    _pending_user_changes(target)[target.id] = (target.eid, target.fname, target.lname, target.email, attrs)
+
+
+@event.listens_for(User, 'after_insert')
+def _queue_user_insert(mapper, connection, target):
+    _queue_user_upsert(target)
+
+
+@event.listens_for(User, 'after_update')
+def _queue_user_update(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in USER_SEARCH_COLUMNS):
+        _queue_user_upsert(target)
+
+
+@event.listens_for(User, 'after_delete')
+def _queue_user_remove(mapper, connection, target):
+    _pending_user_changes(target)[target.id] = None
+
+
+@event.listens_for(db.session, 'before_commit')
+def _bump_user_search_version(session):
+    # Runs after _bump_table_versions has flushed, so every change is queued
+    if not session.info.get('user_search'):
+        return
+    bump = mysql_insert(TableVersion).values(table_name=USER_SEARCH_VERSION, version=1)
+    session.execute(bump.on_duplicate_key_update(version=TableVersion.version + 1))
+    session.info['user_search_version'] = session.execute(
+        select(TableVersion.version).where(TableVersion.table_name == USER_SEARCH_VERSION)
+    ).scalar()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_user_changes(session):
+    changes = session.info.pop('user_search', None)
+    version = session.info.pop('user_search_version', None)
+    if changes and version is not None:
+        user_search.apply(changes, version)
 
-    db.session.commit()
-    print(f"[SUCCESS] Assignee {user.eid} and their tasks removed from project {project_id}")
-    return jsonify({"message": "Assignee removed"}), 200
 
+@event.listens_for(db.session, 'after_rollback')
+def _forget_user_changes(session):
+    session.info.pop('user_search', None)
+    session.info.pop('user_search_version', None)
+
+
+def user_substring_query(query, exclude, args):
+    # Unindexed LIKE scan, only for queries too short to have trigrams
+    pattern = f"%{query.lower()}%"
+    results = db.session.query(User.id).filter(
+        db.or_(
+            db.func.lower(User.fname).like(pattern),
+            db.func.lower(User.lname).like(pattern),
+            db.func.lower(User.email).like(pattern),
+            db.func.lower(User.eid).like(pattern)
+        )
+    )
+    if exclude:
+        results = results.filter(User.id.not_in(exclude))
+    return apply_filters(results, args, USER_FILTERS).order_by(User.fname, User.lname, User.eid)
 
 # ------------------ USER ROUTES ------------------
 
@@ -798,20 +1752,25 @@ def employee_by_id(eid):
 @app.route('/api/search/users', methods=['GET'])
 @jwt_required()
 def search_users():
-    query = request.args.get('q', '').strip().lower()
+    query = request.args.get('q', '').strip()
     if not query:
         return jsonify([])
+    limit = min(parse_limit(request.args, 20), SEARCH_MAX_LIMIT)
+
+    # Ranked ids come from the index, which applies the filters while it
+    # walks the matches
+    where = {param: [v for v in request.args[param].split(",") if v.strip()]
+             for param in USER_FILTERS if request.args.get(param)}
+    ensure_user_search_index()
+    ids = user_search.search(query, limit, where)
+    if len(ids) < limit and len(query) < SEARCH_MIN_TRIGRAM:
+        ids += [row.id for row in user_substring_query(query, ids, request.args).limit(limit - len(ids))]
+    if not ids:
+        return jsonify([])
 
-    results = User.query.filter(
-        db.or_(
-            db.func.lower(User.fname).like(f'%{query}%'),
-            db.func.lower(User.lname).like(f'%{query}%'),
-            db.func.lower(User.email).like(f'%{query}%'),
-            db.func.lower(User.eid).like(f'%{query}%')
-        )
-    ).all()
-
-    return jsonify([user_to_json(u) for u in results])
+    by_id = {u.id: u for u in User.query.filter(User.id.in_(ids))}
+    ranked = [by_id[i] for i in ids if i in by_id][:limit]
+    return list_response(user_to_json(u) for u in ranked)
 
 
 @app.route('/api/users', methods=['POST'])
@@ -825,7 +1784,7 @@ def create_user():
         fname=data.get("fname"),
         lname=data.get("lname"),
         email=data["email"],
-        password=generate_password_hash(data["password"]),
+        password=hash_password(data["password"]),
         role=data.get("role", "employee"),
         did=data.get("did"),
         joinDate=datetime.strptime(data["joinDate"], "%Y-%m-%d") if data.get("joinDate") else None,
@@ -836,19 +1795,30 @@ def create_user():
     log_activity("Employee", f"{user.fname} {user.lname}", "created")
     return jsonify({"message": "User created", "user": user_to_json(user)}), 201
 
+def users_list_query(roles, args):
+    query = User.query.filter(User.role.in_(roles))
+    return apply_date_range(apply_filters(query, args, USER_FILTERS), args, User.joinDate)
+
+
 @app.route('/api/users', methods=['GET'])
 @jwt_required()
+@conditional("user")
+@cached("user")
 def get_users():
-    allowed_roles = ["employee", "admin", "department_manager"]
-    users = User.query.filter(User.role.in_(allowed_roles)).all()
-    return jsonify([user_to_json(u) for u in users])
+    query = users_list_query(["employee", "admin", "department_manager"], request.args)
+    users, next_cursor, paged = paginate(query, request.args, USER_SORTS, "id", User.id,
+                                         stream=stream_query if wants_stream() else None)
+    return list_response((user_to_json(u) for u in users), next_cursor, paged)
 
 @app.route('/api/users/dept', methods=['GET'])
 @jwt_required()
+@conditional("user")
+@cached("user")
 def get_users_dept():
-    allowed_roles = ["employee", "department_manager"]
-    users = User.query.filter(User.role.in_(allowed_roles)).all()
-    return jsonify([user_to_json(u) for u in users])
+    query = users_list_query(["employee", "department_manager"], request.args)
+    users, next_cursor, paged = paginate(query, request.args, USER_SORTS, "id", User.id,
+                                         stream=stream_query if wants_stream() else None)
+    return list_response((user_to_json(u) for u in users), next_cursor, paged)
 
 
 
@@ -861,28 +1831,34 @@ def delete_user(user_id):
         return jsonify({"error": "User not found"}), 404
 
     # Check if user is a department manager
-    is_manager = Department.query.filter_by(managerId=user.eid).first()
+    is_manager = managed_departments_query(user.eid).first()
     if is_manager:
         return jsonify({"error": f"Cannot delete employee '{user.fname} {user.lname}' as they are managing department '{is_manager.name}'."}), 400
 
     try:
+        # Projects whose assignee count and cost totals change with this user
+        project_ids = set(db.session.execute(
+            select(project_assignees.c.project_id).where(project_assignees.c.user_id == user_id)
+            .union(select(ProjectAssignment.project_id).where(ProjectAssignment.user_id == user_id))
+        ).scalars())
+
         # Step 1: Remove from project_assignees table
         db.session.execute(
             project_assignees.delete().where(project_assignees.c.user_id == user_id)
         )
 
-        # Step 2: Log the action
-        log_activity("Employee", f"{user.fname} {user.lname}", "deleted")
-
-        # Step 3: Delete the user
+        # Step 2: Delete the user
         db.session.delete(user)
+        refresh_project_aggregates(project_ids)
         db.session.commit()
 
+        log_activity("Employee", f"{user.fname} {user.lname}", "deleted")
+
         return jsonify({"message": "User deleted"}), 200
 
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print("Error deleting user:", str(e))
+        logger.exception("delete-user failed")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -919,7 +1895,7 @@ def update_user(eid):
     user.did = data.get("did", user.did)
     # Optional: Only update password if provided
     if data.get("password"):
-        user.password = generate_password_hash(data["password"])
+        user.password = hash_password(data["password"])
     db.session.commit()
     log_activity("Employee", f"{user.fname} {user.lname}", "updated")
     return jsonify({"message": "User updated", "user": user_to_json(user)}), 200
@@ -966,6 +1942,8 @@ def update_organisation(org_id):
 
 @app.route('/api/organisations', methods=['GET'])
 @jwt_required()
+@conditional("organisation")
+@cached("organisation")
 def get_organisations():
     orgs = Organisation.query.all()
     return jsonify([
@@ -994,16 +1972,13 @@ def delete_organisation(oid):
 @app.route('/api/organisation-name', methods=['GET'])
 @jwt_required()
 def get_organisation_name():
-    print("🔍 Incoming request to /api/organisation-name")
     try:
         org = Organisation.query.first()
         if not org:
-            print("⚠️ No organisation found in database.")
             return jsonify({"error": "No organisation found"}), 404
-        print(f"✅ Organisation found: {org.name}")
         return jsonify({"name": org.name}), 200
     except Exception as e:
-        print(f"❌ Exception occurred: {e}")
+        logger.exception("organisation-name failed")
         return jsonify({"error": str(e)}), 500
 
 
@@ -1028,29 +2003,26 @@ def create_department():
     if not manager_ids and data.get("managerId"):
         manager_ids = [data.get("managerId")]
 
-    # Only convert non-empty lists into comma-separated strings, else None
-    manager_ids_csv = ','.join(manager_ids) if manager_ids else None
-    primary_manager = manager_ids[0] if manager_ids else None
+    # Validate managers before touching the session
+    managers = User.query.filter(User.eid.in_(manager_ids)).all() if manager_ids else []
+    found = {m.eid for m in managers}
+    for eid in manager_ids:
+        if eid not in found:
+            return jsonify({"error": f"Manager '{eid}' not found"}), 404
 
     # Create the department (no manager required)
     dept = Department(
         did=data.get("did"),
         name=data.get("name"),
-        oid=data.get("oid"),
-        managerId=primary_manager,
-        managerIds=manager_ids_csv
+        oid=data.get("oid")
     )
     db.session.add(dept)
 
-    # Update roles for valid managers, if any
-    for eid in manager_ids:
-        manager = User.query.filter_by(eid=eid).first()
-        if manager:
-            manager.role = "department_manager"
-        else:
-            return jsonify({"error": f"Manager '{eid}' not found"}), 404
+    for manager in managers:
+        manager.role = "department_manager"
 
     try:
+        set_department_managers(dept, manager_ids)
         db.session.commit()
         log_activity("Department", dept.name, "created")
         return jsonify({"message": "Department created"}), 201
@@ -1061,51 +2033,56 @@ def create_department():
 
 @app.route('/api/departments', methods=['GET'])
 @jwt_required()
+@conditional("department", "department_managers")
+@cached("department", "department_managers")
 def get_departments():
+    if wants_stream():
+        return list_response(_departments_in_batches())
+
     depts = Department.query.all()
-    dept_list = []
-    
-    for d in depts:
-        # Handle both old single managerId and new multiple managerIds
-        manager_ids = []
-        if hasattr(d, 'managerIds') and d.managerIds:
-            manager_ids = d.managerIds.split(',')
-        elif d.managerId:
-            manager_ids = [d.managerId]
-        
-        dept_data = {
-            "id": d.id,
-            "did": d.did,
-            "name": d.name,
-            "oid": d.oid,
-            "managerId": d.managerId,  # Keep for backward compatibility
-            "managerIds": manager_ids,  # New field for multiple managers
-            "createdAt": d.createdAt.isoformat() if d.createdAt else None,
-            "updatedAt": d.updatedAt.isoformat() if d.updatedAt else None
-        }
-        dept_list.append(dept_data)
-    
-    return jsonify(dept_list)
+    managers = department_manager_ids([d.did for d in depts])
+    return jsonify([department_to_json(d, managers.get(d.did, [])) for d in depts])
+
+
+def department_to_json(d, manager_ids):
+    return {
+        "id": d.id,
+        "did": d.did,
+        "name": d.name,
+        "oid": d.oid,
+        "managerId": manager_ids[0] if manager_ids else None,  # Keep for backward compatibility
+        "managerIds": manager_ids,  # New field for multiple managers
+        "createdAt": d.createdAt.isoformat() if d.createdAt else None,
+        "updatedAt": d.updatedAt.isoformat() if d.updatedAt else None
+    }
+
+
+def _departments_in_batches():
+    # Keyset batches instead of one server-side cursor: each batch needs a
+    # manager lookup, and a connection cannot run a query mid-cursor
+    last_id = 0
+    while True:
+        depts = (Department.query.filter(Department.id > last_id)
+                 .order_by(Department.id).limit(STREAM_CHUNK_SIZE).all())
+        if not depts:
+            return
+        managers = department_manager_ids([d.did for d in depts])
+        for d in depts:
+            yield department_to_json(d, managers[d.did])
+        last_id = depts[-1].id
 
 
 @app.route('/api/departments/<did>', methods=['PUT'])
 @jwt_required()
 def update_department(did):
-    print(f"🔄 /api/departments/{did} PUT route hit")
-    
     dept = Department.query.filter_by(did=did).first()
     if not dept:
         return jsonify({"error": "Department not found"}), 404
 
     data = request.json
-    print("📥 Update Data:", data)
 
     # Get old manager IDs for role reversion
-    old_manager_ids = []
-    if hasattr(dept, 'managerIds') and dept.managerIds:
-        old_manager_ids = dept.managerIds.split(',')
-    elif dept.managerId:
-        old_manager_ids = [dept.managerId]
+    old_manager_ids = department_manager_ids([dept.did])[dept.did]
 
     # Handle both single managerId (backward compatibility) and multiple managerIds
     new_manager_ids = data.get("managerIds", [])
@@ -1114,54 +2091,37 @@ def update_department(did):
         new_manager_ids = [data.get("managerId")]
 
     if not new_manager_ids:
-        print("❌ No managers specified")
         return jsonify({"error": "At least one manager is required"}), 400
 
     # Validate all new manager IDs exist
-    invalid_managers = []
-    valid_new_managers = []
-    
-    for manager_id in new_manager_ids:
-        manager = User.query.filter_by(eid=manager_id).first()
-        if manager:
-            valid_new_managers.append(manager)
-        else:
-            invalid_managers.append(manager_id)
+    valid_new_managers = User.query.filter(User.eid.in_(new_manager_ids)).all()
+    found = {m.eid for m in valid_new_managers}
+    invalid_managers = [manager_id for manager_id in new_manager_ids if manager_id not in found]
     
     if invalid_managers:
-        print(f"❌ Invalid manager IDs: {invalid_managers}")
         return jsonify({"error": f"Manager users not found: {', '.join(invalid_managers)}"}), 404
 
     # Update department fields
     dept.name = data.get("name", dept.name)
     dept.oid = data.get("oid", dept.oid)
-    dept.managerId = new_manager_ids[0]  # Primary manager for backward compatibility
-    dept.managerIds = ','.join(new_manager_ids)  # All managers
+    set_department_managers(dept, new_manager_ids)
 
     # Handle role changes
     # First, revert old managers who are no longer managers of this department
     managers_to_remove = set(old_manager_ids) - set(new_manager_ids)
-    for manager_id in managers_to_remove:
-        manager = User.query.filter_by(eid=manager_id).first()
-        if manager:
+    if managers_to_remove:
+        for manager in User.query.filter(User.eid.in_(managers_to_remove)).all():
             # Check if they still manage other departments
-            still_managing = Department.query.filter(
-                Department.did != did,
-                Department.managerIds.like(f'%{manager_id}%')
-            ).first()
-            
-            if not still_managing:
+            if not manages_other_department(manager.eid, exclude_did=did):
                 manager.role = "employee"
-                print(f"🔄 Reverted {manager.eid}'s role back to employee")
+                logger.info("Reverted %s's role to employee", manager.eid)
 
     # Update new managers' roles
     for manager in valid_new_managers:
         manager.role = "department_manager"
-        print(f"👤 Manager role updated: {manager.eid}")
 
     try:
         db.session.commit()
-        print("✅ Department updated successfully")
         log_activity("Department", dept.name, "updated")
         
         # Return updated department data
@@ -1171,14 +2131,14 @@ def update_department(did):
             "name": dept.name,
             "oid": dept.oid,
             "managerId": dept.managerId,
-            "managerIds": new_manager_ids,
+            "managerIds": list(dict.fromkeys(new_manager_ids)),
             "createdAt": dept.createdAt.isoformat() if dept.createdAt else None,
             "updatedAt": dept.updatedAt.isoformat() if dept.updatedAt else None
         }), 200
         
     except SQLAlchemyError as e:
         db.session.rollback()
-        print("💥 Database error:", str(e))
+        logger.exception("update-department: database error")
         return jsonify({"error": "Database error", "details": str(e)}), 500
 
 
@@ -1199,28 +2159,19 @@ def delete_department(did):
         return jsonify({"error": "Cannot delete department with existing projects"}), 400
 
     # Get all manager IDs for role reversion
-    manager_ids_to_check = []
-    if hasattr(dept, 'managerIds') and dept.managerIds:
-        manager_ids_to_check = dept.managerIds.split(',')
-    elif dept.managerId:
-        manager_ids_to_check = [dept.managerId]
+    manager_ids_to_check = department_manager_ids([dept.did])[dept.did]
 
+    set_department_managers(dept, [])
     db.session.delete(dept)
-    db.session.commit()
 
     # Revert manager roles if they no longer manage any departments
-    for manager_id in manager_ids_to_check:
-        manager = User.query.filter_by(eid=manager_id).first()
-        if manager:
-            # Check if they still manage other departments
-            still_managing = Department.query.filter(
-                Department.managerIds.like(f'%{manager_id}%')
-            ).first()
-            
-            if not still_managing:
+    if manager_ids_to_check:
+        for manager in User.query.filter(User.eid.in_(manager_ids_to_check)).all():
+            if not manages_other_department(manager.eid):
                 manager.role = "employee"
-                db.session.commit()
-                print(f"🔄 Reverted {manager.eid}'s role back to employee")
+                logger.info("Reverted %s's role to employee", manager.eid)
+
+    db.session.commit()
 
     log_activity("Department", dept.name, "deleted")
     return jsonify({"message": "Department deleted successfully"}), 200
@@ -1244,18 +2195,14 @@ def create_project():
 
 @app.route('/api/projects', methods=['GET'])
 @jwt_required()
+@conditional("project")
+@cached("project")
 def get_projects():
-    projects = Project.query.all()
-    return jsonify([{
-        "id": p.id,
-        "name": p.name,
-        "departmentId": p.departmentId,
-        "startDate": p.startDate.strftime('%Y-%m-%d'),
-        "endDate": p.endDate.strftime('%Y-%m-%d'),
-        #"budget": p.budget,
-        "createdAt": p.createdAt.isoformat() if p.createdAt else None,
-        "updatedAt": p.updatedAt.isoformat() if p.updatedAt else None
-    } for p in projects])
+    query = apply_filters(Project.query, request.args, PROJECT_FILTERS)
+    query = apply_date_range(query, request.args, Project.startDate, Project.endDate)
+    projects, next_cursor, paged = paginate(query, request.args, PROJECT_SORTS, "id", Project.id,
+                                            stream=stream_query if wants_stream() else None)
+    return list_response((project_to_json(p) for p in projects), next_cursor, paged)
 
 @app.route('/api/projects/<int:project_id>', methods=['DELETE'])
 @jwt_required()
@@ -1264,6 +2211,7 @@ def delete_project(project_id):
     if not proj:
         return jsonify({"error": "Project not found"}), 404
     db.session.delete(proj)
+    refresh_project_aggregates([project_id])
     db.session.commit()
     log_activity("Project", proj.name, "deleted")
     return jsonify({"message": "Project deleted"}), 200
@@ -1280,6 +2228,7 @@ def update_project(project_id):
     project.endDate = datetime.strptime(data['endDate'], '%Y-%m-%d')
     #project.budget = float(data['budget'])
 
+    refresh_project_aggregates([project.id])
     db.session.commit()
     log_activity("Project", project.name, "updated")
     return jsonify({
@@ -1293,46 +2242,43 @@ def update_project(project_id):
 
 @app.route('/api/project-budgets', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_project_budgets():
     try:
         results = (
-            db.session.query(Project.name, func.sum(ProjectAssignment.cost))
-            .join(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-            .group_by(Project.name)
+            project_financials_query(Project.name)
+            .filter(ProjectFinancials.assignment_count > 0)
             .all()
         )
         return jsonify([
-            {"name": name, "cost": float(cost)} for name, cost in results
+            {"name": p.name, "cost": float(p.total_cost)} for p in results
         ]), 200
     except Exception as e:
-        print("🔴 Error in /api/project-budgets:", e)
+        logger.exception("project-budgets failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/projects/<int:project_id>/total-cost', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_project_total_cost(project_id):
-    total_cost = db.session.query(db.func.sum(ProjectAssignment.cost))\
-        .filter_by(project_id=project_id).scalar()
-
-    actual_cost = db.session.query(db.func.sum(ProjectAssignment.actual_cost))\
-        .filter_by(project_id=project_id).scalar()
+    financials = db.session.get(ProjectFinancials, project_id)
 
     return jsonify({
-        "totalCost": float(total_cost or 0),
-        "actualCost": float(actual_cost or 0)
+        "totalCost": float(financials.total_cost if financials else 0),
+        "actualCost": float(financials.actual_cost if financials else 0)
     })
 
+def upcoming_deadlines_query(today, limit=5):
+    return Project.query.filter(Project.endDate >= today).order_by(Project.endDate).limit(limit)
+
+
 @app.route('/api/projects/upcoming-deadlines', methods=['GET'])
 @jwt_required()
+@cached("project")
 def get_upcoming_deadlines():
-    today = datetime.today().date()
-    upcoming = (
-        Project.query
-        .filter(Project.endDate >= today)
-        .order_by(Project.endDate)
-        .limit(5)
-        .all()
-    )
+    upcoming = upcoming_deadlines_query(datetime.today().date()).all()
     result = [{
         "id": p.id,
         "name": p.name,
@@ -1342,10 +2288,8 @@ def get_upcoming_deadlines():
     return jsonify(result), 200
 
 # ------------------ ASSIGNEES ROUTES ------------------
-@app.route('/api/projects/<int:project_id>/assignees', methods=['GET'])
-@jwt_required()
-def get_assignees(project_id):
-    result = db.session.query(
+def assignees_query(project_id):
+    return db.session.query(
         User.eid,
         User.fname,
         User.lname,
@@ -1371,26 +2315,31 @@ def get_assignees(project_id):
             ProjectAssignment.project_id == project_id
         ),
         isouter=True
-    ).all()
+    )
 
-    assignees = []
-    for eid, fname, lname, email, role, hours, rate, actual_cost, allocated_percentage, start_date, end_date in result:
-        cost = round((hours or 0) * (rate or 0), 2)
-        assignees.append({
-            'eid': eid,
-            'fname': fname,
-            'lname': lname,
-            'email': email,
-            'role': role,
-            'cost': cost,
-            'actual_cost': round(actual_cost, 2) if actual_cost is not None else None,
-            'start_date': start_date.isoformat() if start_date else None,
-            'end_date': end_date.isoformat() if end_date else None,
-            'allocation_percentage': allocated_percentage if allocated_percentage is not None else None,
 
-        })
+def assignee_dict(row):
+    eid, fname, lname, email, role, hours, rate, actual_cost, allocated_percentage, start_date, end_date = row
+    cost = round((hours or 0) * (rate or 0), 2)
+    return {
+        'eid': eid,
+        'fname': fname,
+        'lname': lname,
+        'email': email,
+        'role': role,
+        'cost': cost,
+        'actual_cost': round(actual_cost, 2) if actual_cost is not None else None,
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'allocation_percentage': allocated_percentage if allocated_percentage is not None else None,
+
+    }
 
-    return jsonify(assignees)
+
+@app.route('/api/projects/<int:project_id>/assignees', methods=['GET'])
+@jwt_required()
+def get_assignees(project_id):
+    return jsonify([assignee_dict(row) for row in assignees_query(project_id).all()])
 
 @app.route('/api/projects/<int:project_id>/assignees', methods=['POST'])
 @jwt_required()
@@ -1441,20 +2390,19 @@ def add_assignee(project_id):
             "role": role
         })
     )
+    refresh_project_aggregates([project_id])
     db.session.commit()
     return jsonify({"message": "Assignee added with role"}), 200
 
 @app.route('/api/projects/<int:project_id>/assignees/<eid>', methods=['DELETE'])
 @jwt_required()
 def remove_assignee(project_id, eid):
-    print(f"[DELETE] Request to remove EID={eid} from Project ID={project_id}")
 
     user = User.query.filter_by(eid=eid).first()
     if not user:
-        print(f"[ERROR] User with EID={eid} not found")
+        logger.info("remove-assignee: user %s not found", eid)
         return jsonify({"error": "User not found"}), 404
 
-    print(f"[INFO] Found User ID={user.id} with EID={user.eid}")
 
     # Check assignment to verify role
     assignment = db.session.execute(
@@ -1467,14 +2415,13 @@ def remove_assignee(project_id, eid):
     ).first()
 
     if not assignment:
-        print(f"[ERROR] No assignment found for EID={eid} in project {project_id}")
+        logger.info("remove-assignee: %s is not assigned to project %s", eid, project_id)
         return jsonify({"error": "Assignee not found in project"}), 404
 
     role = assignment._mapping.get("role")
-    print(f"[INFO] Assignee role is '{role}'")
 
     if role == "Project Manager":
-        print("[BLOCKED] Cannot remove the Project Manager")
+        logger.info("remove-assignee: refused to remove the project manager of project %s", project_id)
         return jsonify({"error": "Cannot remove the Project Manager from the project"}), 403
 
     # Delete from project_assignees
@@ -1493,25 +2440,79 @@ def remove_assignee(project_id, eid):
         user_id=user.id
     ).delete()
 
+    refresh_project_aggregates([project_id])
     db.session.commit()
-    print(f"[SUCCESS] Removed EID={eid} from Project ID={project_id}")
+    logger.info("Removed %s from project %s", eid, project_id)
     return jsonify({"message": "Assignee removed"}), 200
 
 # ------------------ RECENT ACTIVITY ------------------
 @app.route("/api/recent-activities", methods=["GET"])
 @jwt_required()
 def get_recent_activities():
-    activities = ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(10).all()
+    default_limit = 10
+    query = apply_filters(ActivityLog.query, request.args, ACTIVITY_FILTERS)
+    query = apply_date_range(query, request.args, ActivityLog.timestamp)
+    activities, next_cursor, paged = paginate(query, request.args, ACTIVITY_SORTS, "-timestamp",
+                                              ActivityLog.id, default_limit=default_limit)
+    events = [(a.type, a.name, a.action, a.timestamp) for a in activities]
+
+    # The default "latest N" view also shows events still waiting to be
+    # written; the spool is read after the rows, so none is listed twice
+    if not paged and request.args.get("sort", "-timestamp") == "-timestamp":
+        pending = [
+            (e["type"], e["name"], e["action"], e["timestamp"]) for e in activity_writer.pending()
+            if all(not request.args.get(param) or e[column.key] in request.args[param].split(",")
+                   for param, column in ACTIVITY_FILTERS.items())
+        ]
+        if pending and not (request.args.get("from") or request.args.get("to")):
+            events = sorted(pending + events, key=lambda e: e[3], reverse=True)[:default_limit]
+
     result = [
         {
-            "entity": a.type,
-            "user": a.name,
-            "action": a.action,
-            "timestamp": a.timestamp.isoformat()
+            "entity": entity,
+            "user": name,
+            "action": action,
+            "timestamp": timestamp.isoformat()
         }
-        for a in activities
+        for entity, name, action, timestamp in events
     ]
-    return jsonify(result), 200
+    return list_response(result, next_cursor, paged), 200
+
+
+# Retention: rows older than ACTIVITY_RETENTION_DAYS are moved to
+# activity_log_archive (or deleted with ACTIVITY_ARCHIVE=0) in small batches.
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "365"))
+ACTIVITY_ARCHIVE = os.getenv("ACTIVITY_ARCHIVE", "1") == "1"
+
+
+def prune_activity(days=ACTIVITY_RETENTION_DAYS, archive=ACTIVITY_ARCHIVE, batch_size=5000):
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    log = ActivityLog.__table__
+    columns = [log.c.id, log.c.type, log.c.name, log.c.action, log.c.timestamp]
+    pruned = 0
+    while True:
+        with db.engine.begin() as conn:
+            ids = conn.execute(
+                select(log.c.id).where(log.c.timestamp < cutoff).order_by(log.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return pruned
+            if archive:
+                conn.execute(
+                    ActivityLogArchive.__table__.insert().prefix_with("IGNORE").from_select(
+                        [c.key for c in columns], select(*columns).where(log.c.id.in_(ids))
+                    )
+                )
+            conn.execute(log.delete().where(log.c.id.in_(ids)))
+        pruned += len(ids)
+
+
+@app.cli.command("prune-activity")
+@click.option("--days", type=int, default=ACTIVITY_RETENTION_DAYS, show_default=True)
+@click.option("--archive/--no-archive", default=ACTIVITY_ARCHIVE, show_default=True)
+def prune_activity_command(days, archive):
+    pruned = prune_activity(days, archive)
+    print(f"✅ {'Archived' if archive else 'Deleted'} {pruned} activity rows older than {days} days")
 
 @app.route('/api/user-info', methods=['GET'])
 @jwt_required()
@@ -1528,159 +2529,132 @@ def user_info():
 # ------------------ Department Manager ------------------
 @app.route('/api/dm-departments', methods=['GET'])
 @jwt_required()
+@cached("department", "department_managers", "user")
 def get_managed_departments():
-    user_id = get_jwt_identity()  # should return int or str user ID
-
-    print("User ID from token:", user_id)
-
-    # Get the user
-    user = User.query.filter_by(id=user_id).first()
-    print("Fetched User:", user)
-
+    user = current_user_claims()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    if user.role != 'department_manager':
-        print("Unauthorized role:", user.role)
+    if user["role"] != 'department_manager':
         return jsonify({"error": "Unauthorized access"}), 403
 
-    departments = Department.query.all()
-    print(f"Found {len(departments)} departments in total.")
+    departments = managed_departments_query(user["eid"]).all()
+    managers = department_manager_ids([dept.did for dept in departments])
 
     result = []
     for dept in departments:
-        manager_ids = []
-        if hasattr(dept, 'managerIds') and dept.managerIds:
-            manager_ids = [mid.strip() for mid in dept.managerIds.split(',')]
-        elif dept.managerId:
-            manager_ids = [dept.managerId]
+        manager_ids = managers.get(dept.did, [])
+        result.append({
+            'did': dept.did,
+            'name': dept.name,
+            'oid': dept.oid,
+            'managerId': manager_ids[0] if manager_ids else None,
+            'managerIds': manager_ids,
+        })
 
-        print(f"Dept {dept.did} managers: {manager_ids}")
+    return jsonify(result), 200
 
-        if user.eid in manager_ids:
-            result.append({
-                'did': dept.did,
-                'name': dept.name,
-                'oid': dept.oid,
-                'managerId': dept.managerId,
-                'managerIds': manager_ids,
-            })
+def dm_projects_query(eid):
+    return Project.query.join(
+        department_managers, department_managers.c.department_did == Project.departmentId
+    ).filter(department_managers.c.manager_eid == eid)
 
-    print(f"Returning {len(result)} managed departments.")
-    return jsonify(result), 200
 
 @app.route('/api/dm-projects', methods=['GET'])
 @jwt_required()
+@cached("project", "department", "department_managers", "user")
 def get_projects_for_department_manager():
-    user_id = get_jwt_identity()
-    user = User.query.filter_by(id=user_id).first()
-
+    user = current_user_claims()
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
     # If the user is a department manager, filter projects by their departments
-    if user.role == 'department_manager':
-        managed_departments = Department.query.filter_by(managerId=user.eid).all()
-        department_ids = [d.did for d in managed_departments]
-
-        if not department_ids:
-            return jsonify([])
-
-        projects = Project.query.filter(Project.departmentId.in_(department_ids)).all()
+    if user["role"] == 'department_manager':
+        query = dm_projects_query(user["eid"])
     else:
         # For other roles (e.g., admin), return all projects
-        projects = Project.query.all()
+        query = Project.query
 
-    return jsonify([{
-        "id": p.id,
-        "name": p.name,
-        "departmentId": p.departmentId,
-        "startDate": p.startDate.strftime('%Y-%m-%d'),
-        "endDate": p.endDate.strftime('%Y-%m-%d'),
-        #"budget": p.budget,
-        "createdAt": p.createdAt.isoformat() if p.createdAt else None,
-        "updatedAt": p.updatedAt.isoformat() if p.updatedAt else None
-    } for p in projects])
+    query = apply_filters(query, request.args, PROJECT_FILTERS)
+    query = apply_date_range(query, request.args, Project.startDate, Project.endDate)
+    projects, next_cursor, paged = paginate(query, request.args, PROJECT_SORTS, "id", Project.id)
+    return list_response([project_to_json(p) for p in projects], next_cursor, paged)
 
 @app.route('/api/dm-project-budgets', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_dm_project_budgets():
-    current_user_id = get_jwt_identity()
-
-    user = User.query.filter_by(id=current_user_id).first()
+    user = current_user_claims()
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    if user.role != 'department_manager':
+    if user["role"] != 'department_manager':
         return jsonify({'error': 'Unauthorized'}), 403
 
-    departments = Department.query.filter_by(managerId=user.eid).all()
-    department_ids = [d.did for d in departments]
-
-    if not department_ids:
-        return jsonify([]), 200
-
-    # 🧠 Fetch revenue, cost and compute margin per project
+    # 🧠 Read revenue, cost and margin per project
     results = (
-        db.session.query(
-            Project.name,
-            func.coalesce(func.sum(ProjectAssignment.cost), 0).label("revenue"),
-            func.coalesce(func.sum(ProjectAssignment.actual_cost), 0).label("actual_cost")
-        )
-        .join(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-        .filter(Project.departmentId.in_(department_ids))
-        .group_by(Project.name)
+        project_financials_query(Project.name)
+        .join(department_managers, department_managers.c.department_did == Project.departmentId)
+        .filter(department_managers.c.manager_eid == user["eid"], ProjectFinancials.assignment_count > 0)
         .all()
     )
 
     return jsonify([
         {
-            "name": name,
-            "cost": float(revenue),  # frontend expects revenue under 'cost'
-            "actual_cost": float(actual_cost),  # real cost
-            "margin": float(revenue) - float(actual_cost)
-        } for name, revenue, actual_cost in results
+            "name": p.name,
+            "cost": float(p.total_cost),  # frontend expects revenue under 'cost'
+            "actual_cost": float(p.actual_cost),  # real cost
+            "margin": float(p.margin)
+        } for p in results
     ]), 200
 
 
+def department_totals_query(department_ids):
+    return db.session.query(
+        ProjectMonthlyRollup.department_id,
+        func.coalesce(func.sum(ProjectMonthlyRollup.revenue), 0),
+        func.coalesce(func.sum(ProjectMonthlyRollup.actual_cost), 0)
+    ).filter(
+        ProjectMonthlyRollup.department_id.in_(department_ids)
+    ).group_by(ProjectMonthlyRollup.department_id)
+
+
 @app.route('/api/department-projects', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def department_project_summary():
-    import json  # To log JSON response properly in console
-
-    user_id = get_jwt_identity()
-
-    user = User.query.filter_by(id=user_id).first()
+    user = current_user_claims()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    if user.role != 'department_manager':
+    if user["role"] != 'department_manager':
         return jsonify({"error": "Unauthorized"}), 403
 
-    departments = Department.query.filter_by(managerId=user.eid).all()
+    departments = managed_departments_query(user["eid"]).all()
     if not departments:
         return jsonify([]), 200
 
+    department_ids = [d.did for d in departments]
+
+    projects_by_dept = {}
+    for p in Project.query.filter(Project.departmentId.in_(department_ids)).all():
+        projects_by_dept.setdefault(p.departmentId, []).append(p)
+
+    # Revenue and actual cost per department straight from the monthly rollup
+    totals = {
+        did: (float(revenue), float(actual_cost))
+        for did, revenue, actual_cost in department_totals_query(department_ids)
+    }
+
     result = []
     for dept in departments:
-        projects = Project.query.filter_by(departmentId=dept.did).all()
+        projects = projects_by_dept.get(dept.did)
         if not projects:
             continue
 
-        project_ids = [p.id for p in projects]
-
-        # Aggregate revenue and actual cost
-        cost_data = (
-            db.session.query(
-                func.coalesce(func.sum(ProjectAssignment.cost), 0),            # revenue
-                func.coalesce(func.sum(ProjectAssignment.actual_cost), 0)      # actual cost
-            )
-            .filter(ProjectAssignment.project_id.in_(project_ids))
-            .first()
-        )
-
-        total_revenue = float(cost_data[0])
-        total_cost = float(cost_data[1])
+        total_revenue, total_cost = totals.get(dept.did, (0.0, 0.0))
         total_profit = total_revenue - total_cost
 
         project_list = [{
@@ -1701,12 +2675,17 @@ def department_project_summary():
             "profit": total_profit           # shown as Profit in frontend
         })
 
-
     return jsonify(result), 200
 
 # -----------------FY----------------------
+def overlapping(query, start, end):
+    # Projects running at any point in [start, end]
+    return query.filter(Project.endDate >= start, Project.startDate <= end)
+
+
 @app.route('/api/projects/by-fy', methods=['GET'])
 @jwt_required()
+@cached("project")
 def get_projects_by_date_range():
     start_str = request.args.get('startDate')
     end_str = request.args.get('endDate')
@@ -1718,10 +2697,7 @@ def get_projects_by_date_range():
         fy_start = datetime.strptime(start_str, "%Y-%m-%d")
         fy_end = datetime.strptime(end_str, "%Y-%m-%d")
 
-        projects = Project.query.filter(
-            Project.endDate >= fy_start,
-            Project.startDate <= fy_end
-        ).all()
+        projects = overlapping(Project.query, fy_start, fy_end).all()
 
         return jsonify([{
             "id": p.id,
@@ -1737,6 +2713,8 @@ def get_projects_by_date_range():
     
 @app.route('/api/sum-projects-by-fy', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_projects_summary_by_fy():
     start_str = request.args.get('startDate')
     end_str = request.args.get('endDate')
@@ -1749,28 +2727,7 @@ def get_projects_summary_by_fy():
         fy_end = datetime.strptime(end_str, "%Y-%m-%d")
 
         # Query projects overlapping FY
-        project_data = (
-            db.session.query(
-                Project.id,
-                Project.name,
-                Project.departmentId,
-                Project.startDate,
-                Project.endDate,
-                Project.createdAt,
-                Project.updatedAt,
-                func.coalesce(func.sum(ProjectAssignment.cost), 0).label("total_cost"),
-                func.coalesce(func.sum(ProjectAssignment.actual_cost), 0).label("actual_cost")
-            )
-            .outerjoin(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-            .filter(
-                and_(
-                    Project.endDate >= fy_start,
-                    Project.startDate <= fy_end
-                )
-            )
-            .group_by(Project.id)
-            .all()
-        )
+        project_data = overlapping(projects_summary_query(), fy_start, fy_end).all()
 
         return jsonify([
             {
@@ -1778,7 +2735,7 @@ def get_projects_summary_by_fy():
                 "name": p.name,
                 "cost": float(p.total_cost),
                 "actual_cost": float(p.actual_cost),
-                "margin": float(p.total_cost) - float(p.actual_cost),
+                "margin": float(p.margin),
                 "departmentId": p.departmentId,
                 "startDate": p.startDate.strftime('%Y-%m-%d') if p.startDate else None,
                 "endDate": p.endDate.strftime('%Y-%m-%d') if p.endDate else None,
@@ -1788,46 +2745,35 @@ def get_projects_summary_by_fy():
             for p in project_data
         ]), 200
 
-    except Exception as e:
-        print("🔴 Error in /api/sum-projects-by-fy:", e)
+    except Exception:
+        logger.exception("sum-projects-by-fy failed")
         return jsonify({"error": "Internal Server Error"}), 500
     
 @app.route('/api/project-budgets-by-fy', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_project_budgets_by_fy():
     try:
         start_date = request.args.get('startDate')
         end_date = request.args.get('endDate')
 
-        print(f"📥 Received FY range: start={start_date}, end={end_date}")
-
         if not start_date or not end_date:
-            print("⚠️ Missing date range in query params")
             return jsonify({"error": "Missing date range"}), 400
 
         # Query projects active in the given FY range
-        projects = (
-            db.session.query(
-                Project.id,
-                Project.name,
-                func.coalesce(func.sum(ProjectAssignment.cost), 0).label('revenue'),
-                func.coalesce(func.sum(ProjectAssignment.actual_cost), 0).label('actual_cost')
-            )
-            .outerjoin(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-            .filter(Project.startDate <= end_date, Project.endDate >= start_date)
-            .group_by(Project.id)
-            .all()
-        )
-
-        print(f"✅ Found {len(projects)} projects in date range")
+        projects = overlapping(project_financials_query(Project.id, Project.name), start_date, end_date).all()
 
+        debug = logger.isEnabledFor(logging.DEBUG)
         result = []
         for p in projects:
-            revenue = float(p.revenue)
+            revenue = float(p.total_cost)
             actual_cost = float(p.actual_cost)
-            margin = revenue - actual_cost
+            margin = float(p.margin)
 
-            print(f"➡️ Project: {p.name}, Revenue: {revenue}, Cost: {actual_cost}, Margin: {margin}")
+            if debug:
+                logger.debug("project-budgets-by-fy: %s revenue=%s cost=%s margin=%s",
+                             p.name, revenue, actual_cost, margin)
 
             result.append({
                 "id": p.id,
@@ -1839,65 +2785,59 @@ def get_project_budgets_by_fy():
 
         return jsonify(result), 200
 
-    except Exception as e:
-        print("❌ Error in /api/project-budgets-by-fy:", e)
+    except Exception:
+        logger.exception("project-budgets-by-fy failed")
         return jsonify({"error": "Internal Server Error"}), 500
 
 
+def projects_summary_query():
+    return project_financials_query(
+        Project.id,
+        Project.name,
+        Project.departmentId,
+        Project.startDate,
+        Project.endDate,
+        Project.createdAt,
+        Project.updatedAt
+    )
+
+
+def project_summary_dict(p):
+    return {
+        "id": p.id,
+        "name": p.name,
+        "cost": float(p.total_cost),
+        "actual_cost": float(p.actual_cost),
+        "margin": float(p.margin),
+        "departmentId": p.departmentId,
+        "startDate": p.startDate.strftime('%Y-%m-%d') if p.startDate else None,
+        "endDate": p.endDate.strftime('%Y-%m-%d') if p.endDate else None,
+        "createdAt": p.createdAt.isoformat() if p.createdAt else None,
+        "updatedAt": p.updatedAt.isoformat() if p.updatedAt else None
+    }
+
+
 @app.route('/api/sum-projects', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_projects_summary():
     try:
-        # Step 1: Get all project IDs
-        results = db.session.query(Project.id).all()
-        project_ids = [row[0] for row in results]
-
-        if not project_ids:
-            return jsonify([]), 200
-
-        # Step 2: Get project financials
-        project_data = (
-            db.session.query(
-                Project.id,
-                Project.name,
-                Project.departmentId,
-                Project.startDate,
-                Project.endDate,
-                Project.createdAt,
-                Project.updatedAt,
-                func.coalesce(func.sum(ProjectAssignment.cost), 0).label("total_cost"),
-                func.coalesce(func.sum(ProjectAssignment.actual_cost), 0).label("actual_cost")
-            )
-            .outerjoin(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-            .filter(Project.id.in_(project_ids))
-            .group_by(Project.id)
-            .all()
-        )
+        # Step 1: Get project financials
+        project_data = projects_summary_query().all()
 
-        # Step 3: Format and return response
-        return jsonify([
-            {
-                "id": p.id,
-                "name": p.name,
-                "cost": float(p.total_cost),
-                "actual_cost": float(p.actual_cost),
-                "margin": float(p.total_cost) - float(p.actual_cost),
-                "departmentId": p.departmentId,
-                "startDate": p.startDate.strftime('%Y-%m-%d') if p.startDate else None,
-                "endDate": p.endDate.strftime('%Y-%m-%d') if p.endDate else None,
-                "createdAt": p.createdAt.isoformat() if p.createdAt else None,
-                "updatedAt": p.updatedAt.isoformat() if p.updatedAt else None
-            }
-            for p in project_data
-        ]), 200
+        # Step 2: Format and return response
+        return jsonify([project_summary_dict(p) for p in project_data]), 200
 
-    except Exception as e:
-        print("🔴 Error in /api/sum-projects:", e)
+    except Exception:
+        logger.exception("sum-projects failed")
         return jsonify({"error": "Internal Server Error"}), 500
     
 
 @app.route('/api/projects-by-pm', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_projects_by_project_manager():
     try:
         # Alias tables for clarity
@@ -1953,16 +2893,66 @@ def get_projects_by_project_manager():
 
         return jsonify(list(grouped.values())), 200
 
-    except Exception as e:
-        print("🔴 Error in /api/projects-by-pm:", str(e))
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("projects-by-pm failed")
         return jsonify({"error": "Internal server error"}), 500
 
+MONTHWISE_VIEWS = ("proj", "org", "dept")
+
+
+def monthwise_query(view, id_filter=None):
+    # Revenue and cost per (department,) project and month from the monthly
+    # rollup, shared by the report and its export
+    if view == 'proj':
+        query = db.session.query(
+            Project.id.label("project_id"),
+            Project.name.label("project_name"),
+            ProjectMonthlyRollup.month.label("month"),
+            func.sum(ProjectMonthlyRollup.revenue).label("revenue"),
+            func.sum(ProjectMonthlyRollup.actual_cost).label("cost")
+        ).join(ProjectMonthlyRollup, and_(
+            Project.id == ProjectMonthlyRollup.project_id,
+            ProjectMonthlyRollup.month > 0
+        ))
+
+        if id_filter:
+            query = query.filter(Project.id == id_filter)
+
+        return query.group_by("project_id", "project_name", "month")
+
+    if view == 'org':
+        return db.session.query(
+            Project.id.label("project_id"),
+            Project.name.label("project_name"),
+            ProjectMonthlyRollup.month.label("month"),
+            func.sum(ProjectMonthlyRollup.revenue).label("revenue"),
+            func.sum(ProjectMonthlyRollup.actual_cost).label("cost")
+        ).outerjoin(ProjectMonthlyRollup, and_(
+            Project.id == ProjectMonthlyRollup.project_id,
+            ProjectMonthlyRollup.month > 0
+        )).group_by("project_id", "project_name", "month")
+
+    return db.session.query(
+        Department.did.label("did"),
+        Department.name.label("department_name"),
+        Project.id.label("project_id"),
+        Project.name.label("project_name"),
+        ProjectMonthlyRollup.month.label("month"),
+        func.sum(ProjectMonthlyRollup.revenue).label("revenue"),
+        func.sum(ProjectMonthlyRollup.actual_cost).label("cost")
+    ).outerjoin(
+        Project, Project.departmentId == Department.did
+    ).outerjoin(ProjectMonthlyRollup, and_(
+        Project.id == ProjectMonthlyRollup.project_id,
+        ProjectMonthlyRollup.month > 0
+    )).group_by("did", "department_name", "project_id", "project_name", "month")
+
+
 @app.route('/api/monthwise-report', methods=['GET'])
 @jwt_required()
+@cached(*BUDGET_TAGS)
+@use_bind("reports")
 def get_monthwise_report():
-    from sqlalchemy import extract
-
     view = request.args.get('view', 'org')
     id_filter = request.args.get('id')
 
@@ -1976,22 +2966,19 @@ def get_monthwise_report():
             "margin": sum(m["margin"] for m in monthly_data.values())
         }
 
+    def add_to_month(monthly_data, row):
+        revenue = row.revenue or 0
+        cost = row.cost or 0
+        bucket = monthly_data[int(row.month)]
+        bucket["revenue"] += revenue
+        bucket["cost"] += cost
+        bucket["margin"] += revenue - cost
+
     result = {}
 
     if view == 'proj':
-        # Project-level single project summary
-        query = db.session.query(
-            Project.id.label("project_id"),
-            Project.name.label("project_name"),
-            extract('month', ProjectAssignment.start_date).label("month"),
-            func.sum(ProjectAssignment.cost).label("revenue"),
-            func.sum(ProjectAssignment.actual_cost).label("cost")
-        ).join(ProjectAssignment, Project.id == ProjectAssignment.project_id)
-
-        if id_filter:
-            query = query.filter(Project.id == id_filter)
-
-        query = query.group_by("project_id", "project_name", "month").all()
+        # Project-level single project summary, read from the monthly rollup
+        query = monthwise_query(view, id_filter).all()
 
         for row in query:
             pid = row.project_id
@@ -2015,89 +3002,224 @@ def get_monthwise_report():
             proj["total"] = calculate_totals(proj["monthly"])
 
     elif view == 'org':
-        # Organisation-level grouped by project
-        projects = Project.query.all()
-
-        for proj in projects:
-            query = db.session.query(
-                extract('month', ProjectAssignment.start_date).label("month"),
-                func.sum(ProjectAssignment.cost).label("revenue"),
-                func.sum(ProjectAssignment.actual_cost).label("cost")
-            ).filter(ProjectAssignment.project_id == proj.id).group_by("month").all()
-
-            result[proj.id] = {
-                "project_name": proj.name,
-                "monthly": empty_months(),
-                "total": {"revenue": 0, "cost": 0, "margin": 0}
-            }
-
-            for row in query:
-                month = int(row.month)
-                revenue = row.revenue or 0
-                cost = row.cost or 0
-                margin = revenue - cost
+        # Organisation-level grouped by project: one grouped query for all projects
+        rows = monthwise_query(view, id_filter).all()
 
-                result[proj.id]["monthly"][month]["revenue"] += revenue
-                result[proj.id]["monthly"][month]["cost"] += cost
-                result[proj.id]["monthly"][month]["margin"] += margin
+        for row in rows:
+            if row.project_id not in result:
+                result[row.project_id] = {
+                    "project_name": row.project_name,
+                    "monthly": empty_months(),
+                    "total": {"revenue": 0, "cost": 0, "margin": 0}
+                }
+            if row.month is not None:
+                add_to_month(result[row.project_id]["monthly"], row)
 
-            result[proj.id]["total"] = calculate_totals(result[proj.id]["monthly"])
+        for proj in result.values():
+            proj["total"] = calculate_totals(proj["monthly"])
 
     elif view == 'dept':
-        # Department-level view with each dept's summary and its projects
-        departments = Department.query.all()
-
-        for dept in departments:
-            dept_data = {
-                "department_name": dept.name,
-                "monthly": empty_months(),
-                "total": {"revenue": 0, "cost": 0, "margin": 0},
-                "projects": {}
-            }
+        # Department-level view: one grouped query on (department, project, month)
+        rows = monthwise_query(view, id_filter).all()
+
+        for row in rows:
+            dept_data = result.get(row.did)
+            if dept_data is None:
+                dept_data = result[row.did] = {
+                    "department_name": row.department_name,
+                    "monthly": empty_months(),
+                    "total": {"revenue": 0, "cost": 0, "margin": 0},
+                    "projects": {}
+                }
+
+            if row.project_id is None:
+                continue
 
-            dept_projects = Project.query.filter_by(departmentId=dept.did).all()
+            proj_data = dept_data["projects"].get(row.project_id)
+            if proj_data is None:
+                proj_data = dept_data["projects"][row.project_id] = {
+                    "project_name": row.project_name,
+                    "monthly": empty_months(),
+                    "total": {"revenue": 0, "cost": 0, "margin": 0}
+                }
 
-            for proj in dept_projects:
-                query = db.session.query(
-                    extract('month', ProjectAssignment.start_date).label("month"),
-                    func.sum(ProjectAssignment.cost).label("revenue"),
-                    func.sum(ProjectAssignment.actual_cost).label("cost")
-                ).filter(ProjectAssignment.project_id == proj.id).group_by("month").all()
+            if row.month is not None:
+                add_to_month(proj_data["monthly"], row)
+                add_to_month(dept_data["monthly"], row)
 
-                proj_monthly = empty_months()
+        for dept_data in result.values():
+            for proj_data in dept_data["projects"].values():
+                proj_data["total"] = calculate_totals(proj_data["monthly"])
+            dept_data["total"] = calculate_totals(dept_data["monthly"])
 
-                for row in query:
-                    month = int(row.month)
-                    revenue = row.revenue or 0
-                    cost = row.cost or 0
-                    margin = revenue - cost
+    return jsonify(result), 200
 
-                    proj_monthly[month]["revenue"] += revenue
-                    proj_monthly[month]["cost"] += cost
-                    proj_monthly[month]["margin"] += margin
 
-                    # Add to department totals
-                    dept_data["monthly"][month]["revenue"] += revenue
-                    dept_data["monthly"][month]["cost"] += cost
-                    dept_data["monthly"][month]["margin"] += margin
 
-                dept_data["projects"][proj.id] = {
-                    "project_name": proj.name,
-                    "monthly": proj_monthly,
-                    "total": calculate_totals(proj_monthly)
-                }
+# ------------------ EXPORTS ------------------
 
-            dept_data["total"] = calculate_totals(dept_data["monthly"])
-            result[dept.did] = dept_data
+MONTHWISE_EXPORT_COLUMNS = {
+    "proj": ["project_id", "project_name", "month", "revenue", "cost", "margin"],
+    "org": ["project_id", "project_name", "month", "revenue", "cost", "margin"],
+    "dept": ["did", "department_name", "project_id", "project_name", "month", "revenue", "cost", "margin"],
+}
+PROJECT_SUMMARY_COLUMNS = ["id", "name", "cost", "actual_cost", "margin", "departmentId",
+                           "startDate", "endDate", "createdAt", "updatedAt"]
+ASSIGNEE_COLUMNS = ["eid", "fname", "lname", "email", "role", "cost", "actual_cost",
+                    "start_date", "end_date", "allocation_percentage"]
+
+
+def export_format():
+    fmt = request.args.get("format", "csv").lower()
+    return fmt if fmt in EXPORT_FORMATS else None
+
+
+@app.route('/api/monthwise-report/export', methods=['GET'])
+@jwt_required()
+@use_bind("reports")
+def export_monthwise_report():
+    view = request.args.get('view', 'org')
+    fmt = export_format()
+    if view not in MONTHWISE_VIEWS or fmt is None:
+        return jsonify({"error": "view must be proj, org or dept and format csv or ndjson"}), 400
+
+    # One flat row per (department,) project and month, ordered so each
+    # project's months are contiguous
+    order = ("did", "project_id", "month") if view == 'dept' else ("project_id", "month")
+    cursor = stream_query(monthwise_query(view, request.args.get('id')).order_by(*order))
+
+    def rows():
+        for row in cursor:
+            revenue = row.revenue or 0
+            cost = row.cost or 0
+            yield {**row._asdict(), "revenue": revenue, "cost": cost, "margin": revenue - cost}
+
+    return export_response(rows(), MONTHWISE_EXPORT_COLUMNS[view], fmt, f"monthwise-{view}")
+
+
+@app.route('/api/sum-projects/export', methods=['GET'])
+@jwt_required()
+@use_bind("reports")
+def export_projects_summary():
+    fmt = export_format()
+    if fmt is None:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    cursor = stream_query(projects_summary_query().order_by(Project.id))
+    rows = (project_summary_dict(p) for p in cursor)
+    return export_response(rows, PROJECT_SUMMARY_COLUMNS, fmt, "project-budgets")
 
-    return jsonify(result), 200
 
+@app.route('/api/projects/<int:project_id>/assignees/export', methods=['GET'])
+@jwt_required()
+def export_assignees(project_id):
+    fmt = export_format()
+    if fmt is None:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    cursor = stream_query(assignees_query(project_id).order_by(User.eid))
+    rows = (assignee_dict(row) for row in cursor)
+    return export_response(rows, ASSIGNEE_COLUMNS, fmt, f"project-{project_id}-assignees")
 
     
+# ------------------ SCHEMA ------------------
+
+@app.cli.command("db-upgrade")
+def db_upgrade_command():
+    db.create_all()
+    try:
+        applied = migrations.upgrade(db.engine, log=print)
+    except migrations.MigrationError as e:
+        raise click.ClickException(str(e))
+    print(f"✅ Schema up to date ({len(applied)} migration(s) applied)")
+
+
+@app.cli.command("delete-duplicates")
+@click.argument("table", type=click.Choice(sorted(migrations.UNIQUE_KEYS)))
+@click.option("--yes", is_flag=True, help="Delete; without it only the duplicates are listed")
+def delete_duplicates_command(table, yes):
+    columns = migrations.UNIQUE_KEYS[table]
+    with db.engine.begin() as conn:
+        total, sample = migrations.find_duplicates(conn, table, columns, limit=100)
+        if not total:
+            print(f"✅ No duplicate ({', '.join(columns)}) rows in {table}")
+            return
+        print(f"{table}: {total} duplicate ({', '.join(columns)}) group(s)")
+        for row in sample:
+            print(f"   {dict(zip(columns, row[:-1]))} x{row[-1]}")
+        if not yes:
+            print("Nothing deleted. Re-run with --yes to keep only the newest row of each group.")
+            return
+        deleted = migrations.delete_duplicates(conn, table, columns)
+    print(f"✅ Deleted {deleted} older duplicate rows from {table}")
+
+
+@app.cli.command("db-status")
+def db_status_command():
+    applied = migrations.applied_versions(db.engine)
+    for version, description, _ in sorted(migrations.MIGRATIONS, key=lambda m: m[0]):
+        mark = "✅" if version in applied else "⏳"
+        print(f"{mark} {version:04d} {description}")
+
+
+# Whole-table reports and the unindexed short-query search scan by design;
+# their plans are printed but do not fail the check
+WHOLE_TABLE_QUERIES = {"monthwise-report:org", "monthwise-report:dept", "sum-projects", "search:short-query"}
+
+
+def hot_queries():
+    # The statements behind the busiest endpoints, built by the same functions
+    # the routes use (needs an app context), keyed by endpoint
+    today = datetime.utcnow().date()
+    fy_start, fy_end = date(today.year, 4, 1), date(today.year + 1, 3, 31)
+    queries = {
+        "login": User.query.filter_by(email="someone@example.com"),
+        "login-pm-check": is_project_manager_stmt(1),
+        "users:sorted-page": page_query(users_list_query(["employee", "admin", "department_manager"], {}),
+                                        {"sort": "fname", "limit": "50"}, USER_SORTS, "id", User.id)[0],
+        "users:filtered-page": page_query(users_list_query(["employee", "department_manager"], {"department": "D001"}),
+                                          {"sort": "-joinDate", "limit": "50"}, USER_SORTS, "id", User.id)[0],
+        "search:short-query": user_substring_query("an", [], {}).limit(20),
+        "employee-financials": employee_financials_query("2024-2025").limit(50),
+        "employee-financials:latest": employee_financials_query(None, did="D001").limit(50),
+        "assign-task:financials": hourly_costs_query(["E001", "E002"], ["2024-2025"]),
+        "assignees": assignees_query(1),
+        "my-projects": projects_summary_query().filter(Project.id.in_([1, 2, 3])),
+        "dm-projects": page_query(dm_projects_query("E001"), {}, PROJECT_SORTS, "id", Project.id)[0],
+        "dm-departments": managed_departments_query("E001"),
+        "department-totals": department_totals_query(["D001"]),
+        "projects-by-fy": overlapping(Project.query, fy_start, fy_end),
+        "sum-projects-by-fy": overlapping(projects_summary_query(), fy_start, fy_end),
+        "sum-projects": projects_summary_query(),
+        "upcoming-deadlines": upcoming_deadlines_query(today),
+        "project-total-cost": project_financials_query(Project.id).filter(Project.id == 1),
+        "monthwise-report:proj": monthwise_query("proj", 1),
+        "monthwise-report:org": monthwise_query("org"),
+        "monthwise-report:dept": monthwise_query("dept"),
+        "recent-activities": page_query(ActivityLog.query, {}, ACTIVITY_SORTS, "-timestamp", ActivityLog.id,
+                                        default_limit=10)[0],
+    }
+    return {name: getattr(query, "statement", query) for name, query in queries.items()}
+
+
+@app.cli.command("check-query-plans")
+def check_query_plans_command():
+    queries = hot_queries()
+    with db.engine.connect() as conn:
+        failures = query_plans.check(conn, queries, allowed=WHOLE_TABLE_QUERIES)
+    for name, problems in failures.items():
+        print(f"❌ {name}: {'; '.join(problems)}")
+    if failures:
+        raise SystemExit(1)
+    print(f"✅ {len(queries) - len(WHOLE_TABLE_QUERIES)} hot queries use indexes without a filesort")
+
 # ------------------ MAIN ------------------
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+        migrations.upgrade(db.engine)
+    clear_shared_dir()  # metrics files from an earlier run
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv("FLASK_DEBUG", "1") == "1")
 
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Endpoint benchmark: latency and SQL statement count for every GET route and
+# the heavy POST paths, run in-process with the Flask test client against the
+# configured database (seed it first with seed_data.py).
+#
+#   python seed_data.py --scale reference --reset
+#   python bench_endpoints.py --iterations 20 --output bench-reference.json
+#
+# Results are JSON keyed by endpoint and tagged with the git commit and row
+# counts, so runs from different commits can be diffed directly. The response
+# cache is off unless --cache is given, so every request reaches the database.
+
+if "--cache" not in sys.argv:
+    os.environ["CACHE_BACKEND"] = "none"
+
+from sqlalchemy import func, select
+
+from app import app, db, generate_token, user_claims, Project, ProjectAssignment, User, project_assignees
+from seed_data import TABLES
+
+SKIP_PREFIXES = ("/static", "/metrics", "/healthz")
+
+# Endpoints that only return data for a particular kind of user
+DM_ENDPOINTS = {"/api/dm-departments", "/api/dm-projects", "/api/dm-project-budgets"}
+PM_ENDPOINTS = {"/api/my-projects", "/api/pm-my-projects", "/api/pm-project-budgets"}
+
+
+def default_args(first_fy):
+    start, end = f"{first_fy}-04-01", f"{first_fy + 1}-03-31"
+    return {
+        "/api/projects/by-fy": {"startDate": start, "endDate": end},
+        "/api/sum-projects-by-fy": {"startDate": start, "endDate": end},
+        "/api/project-budgets-by-fy": {"startDate": start, "endDate": end},
+        "/api/monthwise-report": {"view": "org"},
+        "/api/search/users": {"q": "an"},
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def sample_context():
+    admin = User.query.filter_by(role="admin").order_by(User.id).first()
+    dm = User.query.filter_by(role="department_manager").order_by(User.id).first()
+    pm = (User.query.join(project_assignees, project_assignees.c.user_id == User.id)
+          .filter(project_assignees.c.role == "Project Manager").order_by(User.id).first())
+    if admin is None:
+        sys.exit("No admin user found; seed the database with seed_data.py first")
+
+    # The project with the most assignments exercises the heaviest paths
+    project_id = db.session.execute(
+        select(ProjectAssignment.project_id)
+        .group_by(ProjectAssignment.project_id)
+        .order_by(func.count().desc(), ProjectAssignment.project_id)
+        .limit(1)
+    ).scalar() or db.session.query(func.min(Project.id)).scalar()
+    project = db.session.get(Project, project_id)
+    if project is None:
+        sys.exit("No projects found; seed the database with seed_data.py first")
+
+    assignments = [
+        {
+            "user_id": a.user_id,
+            "percentage": a.allocated_percentage,
+            "billing_rate": a.billing_rate,
+            "start_date": a.start_date.isoformat(),
+            "end_date": a.end_date.isoformat(),
+        } for a in ProjectAssignment.query.filter_by(project_id=project_id)
+    ]
+    assigned = select(project_assignees.c.user_id).where(project_assignees.c.project_id == project_id)
+    outsider = (User.query.filter(User.role != "admin", User.id.not_in(assigned))
+                .order_by(User.id).first())
+
+    return {
+        "tokens": {
+            kind: generate_token(user, user_claims(user))
+            for kind, user in (("admin", admin), ("department_manager", dm), ("project_manager", pm))
+            if user is not None
+        },
+        "project_id": project.id,
+        "assignments": assignments,
+        "outsider_eid": outsider.eid if outsider else None,
+        "first_fy": project.startDate.year if project.startDate.month >= 4 else project.startDate.year - 1,
+    }
+
+
+def get_cases(ctx):
+    args = default_args(ctx["first_fy"])
+    cases = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if "GET" not in rule.methods or rule.rule.startswith(SKIP_PREFIXES):
+            continue
+        if rule.rule in DM_ENDPOINTS:
+            kind = "department_manager"
+        elif rule.rule in PM_ENDPOINTS:
+            kind = "project_manager"
+        else:
+            kind = "admin"
+        if kind not in ctx["tokens"]:
+            continue
+        path = rule.rule.replace("<int:project_id>", str(ctx["project_id"]))
+        cases.append({"name": f"GET {rule.rule}", "method": "GET", "path": path,
+                      "query": args.get(rule.rule, {}), "token": ctx["tokens"][kind]})
+    return cases
+
+
+def post_cases(ctx):
+    project_id = ctx["project_id"]
+    token = ctx["tokens"]["admin"]
+    cases = []
+
+    # Re-submitting the project's existing assignments is an idempotent upsert
+    # that still runs the full validation, costing and aggregate refresh.
+    if ctx["assignments"]:
+        cases.append({
+            "name": "POST /api/assign-task",
+            "method": "POST",
+            "path": "/api/assign-task",
+            "json": {
+                "project_id": project_id,
+                "assignments": ctx["assignments"],
+            },
+            "token": token,
+        })
+
+    if ctx["outsider_eid"]:
+        path = f"/api/projects/{project_id}/assignees"
+        cases.append({
+            "name": "POST /api/projects/<int:project_id>/assignees",
+            "method": "POST",
+            "path": path,
+            "json": {"eid": ctx["outsider_eid"], "role": "Developer"},
+            "token": token,
+            "cleanup": {"method": "DELETE", "path": f"{path}/{ctx['outsider_eid']}"},
+        })
+    return cases
+
+
+def send(client, case, method=None, path=None):
+    return client.open(
+        path or case["path"],
+        method=method or case["method"],
+        query_string=case.get("query") if path is None else None,
+        json=case.get("json") if path is None else None,
+        headers={"Authorization": f"Bearer {case['token']}"},
+    )
+
+
+def run_case(client, case, warmup, iterations):
+    latencies, queries, sizes, statuses = [], [], [], {}
+    for i in range(warmup + iterations):
+        start = time.perf_counter()
+        resp = send(client, case)
+        body = resp.get_data()
+        elapsed = time.perf_counter() - start
+        if "cleanup" in case:
+            send(client, case, case["cleanup"]["method"], case["cleanup"]["path"]).close()
+        if i < warmup:
+            resp.close()
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(int(resp.headers.get("X-Query-Count", 0)))
+        sizes.append(len(body))
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        resp.close()
+
+    return {
+        "path": case["path"],
+        "query": case.get("query") or None,
+        "iterations": iterations,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "max": round(max(latencies), 3),
+            "mean": round(statistics.fmean(latencies), 3),
+        },
+        "queries": {"min": min(queries), "max": max(queries)},
+        "bytes": {"min": min(sizes), "max": max(sizes)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every GET endpoint and the heavy POST paths")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--only", help="run only endpoints whose name contains this text")
+    parser.add_argument("--no-post", action="store_true", help="skip the POST paths")
+    parser.add_argument("--cache", action="store_true", help="keep the configured response cache on")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    with app.app_context():
+        ctx = sample_context()
+        counts = {table.name: db.session.execute(select(func.count()).select_from(table)).scalar()
+                  for table in TABLES}
+        cases = get_cases(ctx) + ([] if args.no_post else post_cases(ctx))
+        db.session.remove()
+
+    if args.only:
+        cases = [c for c in cases if args.only in c["name"]]
+
+    client = app.test_client()
+    results = {}
+    for case in cases:
+        results[case["name"]] = result = run_case(client, case, args.warmup, args.iterations)
+        print(f"{case['name']:60} p50 {result['latency_ms']['p50']:9.1f} ms  "
+              f"p95 {result['latency_ms']['p95']:9.1f} ms  queries {result['queries']['max']:4}  "
+              f"status {','.join(result['statuses'])}", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cache": args.cache,
+        "iterations": args.iterations,
+        "warmup": args.warmup,
+        "rows": counts,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
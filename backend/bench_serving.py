@@ -0,0 +1,115 @@
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Load test for comparing serving modes against the same database, e.g.
+#
+#   python app.py                                   # development server
+#   gunicorn -c gunicorn.conf.py wsgi:app           # production server
+#   python bench_serving.py --email admin@x.com --password ... --concurrency 32
+#
+# Reports throughput and latency percentiles per endpoint.
+
+DEFAULT_ENDPOINTS = [
+    "/api/users",
+    "/api/departments",
+    "/api/projects",
+    "/api/project-budgets",
+    "/api/recent-activities",
+    "/api/monthwise-report?view=org",
+]
+
+
+def login(base_url, email, password):
+    body = json.dumps({"email": email, "password": password}).encode()
+    req = urllib.request.Request(base_url + "/api/login", data=body,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read())["token"]
+
+
+def worker(base_url, endpoints, token, deadline, results, lock):
+    headers = {"Authorization": f"Bearer {token}"}
+    samples = []
+    i = 0
+    while time.time() < deadline:
+        path = endpoints[i % len(endpoints)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(base_url + path, headers=headers)) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 0
+        samples.append((path, status, time.perf_counter() - start))
+    with lock:
+        results.extend(samples)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API endpoints")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--token")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--endpoint", action="append", dest="endpoints")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", help="append a JSON summary to this file")
+    args = parser.parse_args()
+
+    token = args.token or login(args.url, args.email, args.password)
+    endpoints = args.endpoints or DEFAULT_ENDPOINTS
+    results, lock = [], threading.Lock()
+    deadline = time.time() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, endpoints, token, deadline, results, lock))
+        for _ in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    summary = {"label": args.label, "url": args.url, "concurrency": args.concurrency,
+               "duration": args.duration, "requests": len(results),
+               "rps": round(len(results) / args.duration, 1),
+               "errors": sum(1 for _, status, _ in results if status >= 400 or status == 0),
+               "endpoints": {}}
+    for path in endpoints:
+        latencies = [t * 1000 for p, _, t in results if p == path]
+        if not latencies:
+            continue
+        summary["endpoints"][path] = {
+            "count": len(latencies),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+        }
+
+    print(f"{summary['label'] or args.url}: {summary['requests']} requests, "
+          f"{summary['rps']} req/s, {summary['errors']} errors")
+    for path, stats in summary["endpoints"].items():
+        print(f"  {path:40} p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  "
+              f"p99 {stats['p99_ms']:>8} ms  ({stats['count']})")
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(summary) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Response cache with TTL + LRU eviction and tag-based invalidation.
+#
+# Invalidation works by versioning tags: every key embeds the current version
+# of each tag it depends on, and invalidate(tag) bumps that version, so stale
+# entries simply stop being addressed and age out through TTL/LRU. This works
+# the same way for every backend, including a shared Redis.
+#
+# Invalidation only reaches the processes that share the backend, so the
+# default is the disk backend (shared by all workers on a host). Use redis
+# across hosts; the memory backend is for a single process only and is
+# refused under multi-worker gunicorn (see gunicorn.conf.py).
+
+DEFAULT_BACKEND = "disk"
+PROCESS_LOCAL_BACKENDS = {"memory"}
+
+
+def backend_kind():
+    return os.getenv("CACHE_BACKEND", DEFAULT_BACKEND).lower()
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskBackend:
+    ACCESS_RESOLUTION = 30  # seconds
+
+    def __init__(self, directory, max_entries=10000):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "response_cache.sqlite")
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER)")
+
+    def _connect(self):
+        # One connection per thread and process (connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        # Approximate LRU: a hit only writes when the stored access time is
+        # older than ACCESS_RESOLUTION, so hot keys do not queue every reader
+        # behind the WAL write lock
+        if now - row[2] > self.ACCESS_RESOLUTION:
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value), now + ttl, now)
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed LIMIT ?)", (overflow,)
+            )
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def get_counter(self, key):
+        row = self._connect().execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO counters (key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,)
+        )
+        return self.get_counter(key)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+
+class RedisBackend:
+    # Eviction is Redis' job: run it with maxmemory-policy volatile-lru so the
+    # tag counters (stored without expiry) are never evicted.
+    def __init__(self, url, prefix="maxprofit:"):
+        import redis  # optional dependency, only needed for CACHE_BACKEND=redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def get_counter(self, key):
+        raw = self.client.get(self.prefix + "counter:" + key)
+        return int(raw) if raw is not None else 0
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + "counter:" + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "entry:*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    def __init__(self, backend, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    # A failing backend (a locked sqlite file, Redis down) must not fail the
+    # request: reads count as misses, writes are skipped, and both are logged.
+
+    def make_key(self, endpoint, args, identity, tags):
+        # None when the tag versions cannot be read; the caller skips the cache
+        try:
+            versions = [self.backend.get_counter("tag:" + tag) for tag in tags]
+        except Exception:
+            logger.warning("Response cache unavailable, serving uncached", exc_info=True)
+            return None
+        args = sorted((str(k), str(v)) for k, v in args)
+        raw = json.dumps([endpoint, args, identity, list(tags), versions], default=str)
+        return "entry:" + hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception:
+            logger.warning("Response cache read failed for %s", key, exc_info=True)
+            return None
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.backend.set(key, value, ttl or self.default_ttl)
+        except Exception:
+            logger.warning("Response cache write failed for %s", key, exc_info=True)
+
+    def invalidate(self, *tags):
+        for tag in set(tags):
+            try:
+                self.backend.incr("tag:" + tag)
+            except Exception:
+                # Entries for this tag stay addressable until their TTL runs out
+                logger.error("Could not invalidate cache tag %s", tag, exc_info=True)
+
+
+def create_cache():
+    kind = backend_kind()
+    ttl = int(os.getenv("CACHE_DEFAULT_TTL", "60"))
+    max_entries = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+    if kind == "memory":
+        backend = MemoryBackend(max_entries)
+    elif kind == "disk":
+        backend = DiskBackend(os.getenv("CACHE_DIR", "/tmp/maxprofit-cache"), max_entries)
+    elif kind == "redis":
+        backend = RedisBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    elif kind in ("none", "off", ""):
+        backend = None
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND '{kind}'")
+    return ResponseCache(backend, ttl)
@@ -0,0 +1,95 @@
+import json
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOURS_PER_DAY = 8
+
+# year -> sorted list of holidays that fall on a weekday
+_holidays = {}
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+def set_holidays(year, days):
+    weekdays = sorted({d for d in map(_to_date, days) if d.weekday() < 5})
+    if weekdays:
+        _holidays[int(year)] = weekdays
+    else:
+        _holidays.pop(int(year), None)
+    working_days.cache_clear()
+
+
+def get_holidays(year):
+    return list(_holidays.get(int(year), []))
+
+
+def all_holidays():
+    return [day for year in sorted(_holidays) for day in _holidays[year]]
+
+
+def load_holidays(path):
+    # File format: {"2025": ["2025-01-26", "2025-08-15"], ...}
+    with open(path) as fh:
+        table = json.load(fh)
+    for year, days in table.items():
+        set_holidays(year, days)
+
+
+def count_weekdays(start_date, end_date):
+    # Mon-Fri days in [start_date, end_date], without walking the range
+    if end_date < start_date:
+        return 0
+    days = (end_date - start_date).days + 1
+    full_weeks, remainder = divmod(days, 7)
+    first = start_date.weekday()
+    extra = sum(1 for i in range(remainder) if (first + i) % 7 < 5)
+    return full_weeks * 5 + extra
+
+
+def count_holidays(start_date, end_date):
+    total = 0
+    for year in range(start_date.year, end_date.year + 1):
+        days = _holidays.get(year)
+        if days:
+            total += bisect_right(days, end_date) - bisect_left(days, start_date)
+    return total
+
+
+@lru_cache(maxsize=65536)
+def working_days(start_date, end_date):
+    start_date, end_date = _to_date(start_date), _to_date(end_date)
+    if end_date < start_date:
+        return 0
+    return count_weekdays(start_date, end_date) - count_holidays(start_date, end_date)
+
+
+def working_hours(start_date, end_date, percentage=100, hours_per_day=HOURS_PER_DAY):
+    return working_days(start_date, end_date) * hours_per_day * (percentage / 100.0)
+
+
+def working_days_many(intervals):
+    return [working_days(start, end) for start, end in intervals]
+
+
+def working_hours_many(intervals, hours_per_day=HOURS_PER_DAY):
+    # intervals: iterable of (start_date, end_date, percentage)
+    return [
+        working_days(start, end) * hours_per_day * (percentage / 100.0)
+        for start, end, percentage in intervals
+    ]
+
+
+if os.getenv("HOLIDAYS_FILE"):
+    load_holidays(os.getenv("HOLIDAYS_FILE"))
@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli  # optional dependency; without it only gzip is offered
+except ImportError:
+    brotli = None
+
+# Response compression negotiated from Accept-Encoding (br, then gzip).
+#
+# COMPRESS_MIN_SIZE      (default 1024)  smaller bodies are sent as they are
+# COMPRESS_LEVEL         (default 6)     gzip level, 1-9
+# COMPRESS_BR_LEVEL      (default 4)     brotli quality, 0-11
+# COMPRESS_CACHE_BYTES   (default 32MB)  compressed bodies of cacheable responses
+#
+# Responses served through @cached (they carry X-Cache) keep their compressed
+# body in an LRU keyed by a hash of the plain body, so a cache hit is not
+# compressed again. Streamed responses are compressed chunk by chunk and
+# flushed after every chunk so rows keep arriving as they are produced.
+
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "text/csv", "text/plain",
+                      "text/html", "text/css", "application/javascript"}
+
+
+def _gzip(body, level):
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _brotli(body, level):
+    return brotli.compress(body, quality=level)
+
+
+def _gzip_stream(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    return lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli_stream(level):
+    compressor = brotli.Compressor(quality=level)
+    return lambda data: compressor.process(data) + compressor.flush(), compressor.finish
+
+
+class Compressor:
+    def __init__(self, app=None):
+        self.min_size = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+        self.levels = {"gzip": int(os.getenv("COMPRESS_LEVEL", "6")),
+                       "br": int(os.getenv("COMPRESS_BR_LEVEL", "4"))}
+        self.encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+        self.cache_limit = int(os.getenv("COMPRESS_CACHE_BYTES", str(32 * 1024 * 1024)))
+        self._cache = OrderedDict()  # (sha1, encoding) -> compressed body
+        self._cache_size = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        if (request.method == "HEAD" or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            if "X-Cache" in response.headers:
+                compressed = self._cached_compress(body, encoding)
+            else:
+                compressed = self._compress(body, encoding)
+            response.set_data(compressed)
+
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def _compress(self, body, encoding):
+        compress = _brotli if encoding == "br" else _gzip
+        return compress(body, self.levels[encoding])
+
+    def _cached_compress(self, body, encoding):
+        key = (hashlib.sha1(body).digest(), encoding)
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+                return compressed
+
+        compressed = self._compress(body, encoding)
+        if len(compressed) <= self.cache_limit // 8:  # keep one huge body from flushing the rest
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = compressed
+                    self._cache_size += len(compressed)
+                while self._cache_size > self.cache_limit:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cache_size -= len(evicted)
+        return compressed
+
+    def _compress_stream(self, chunks, encoding):
+        start = _brotli_stream if encoding == "br" else _gzip_stream
+        process, finish = start(self.levels[encoding])
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                data = process(chunk)
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            # Closing the inner generator ends its stream_with_context
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
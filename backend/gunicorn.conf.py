@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import sys
+
+# Production server: `gunicorn -c gunicorn.conf.py wsgi:app`
+#
+# The app is imported once in the master (preload) and forked into workers,
+# each serving requests on a pool of threads. Every setting can be overridden
+# through the environment.
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Workers add their metrics to files in METRICS_DIR; start from zero
+    import metrics_utils
+    metrics_utils.clear_shared_dir()
+
+    # A process-local response cache would keep serving entries another
+    # worker has invalidated, so refuse it when there is more than one worker.
+    import cache_utils
+    if server.cfg.workers > 1 and cache_utils.backend_kind() in cache_utils.PROCESS_LOCAL_BACKENDS:
+        raise RuntimeError(
+            f"CACHE_BACKEND={cache_utils.backend_kind()} is per process and cannot be used with "
+            f"{server.cfg.workers} workers; use disk, redis or none"
+        )
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (migrations, create_all) must not be
+    # shared with the workers: drop the inherited pool without closing the
+    # parent's sockets, so every worker opens its own connections.
+    # Per-process state (search index, password pool) rebuilds itself lazily.
+    app_module = sys.modules.get("app")
+    if app_module is None:
+        return
+    with app_module.app.app_context():
+        for engine in app_module.db.engines.values():
+            engine.dispose(close=False)
+
+    # Start the activity writer now rather than on the first event, so events
+    # spooled before a restart are written even if this worker logs none
+    app_module.activity_writer.start()
@@ -0,0 +1,88 @@
+import codecs
+import csv
+import zipfile
+from itertools import islice
+
+# Streaming readers for bulk imports. Rows are yielded one at a time as
+# (line_number, {column: value}) so a file of any size is read in constant
+# memory. Spreadsheets are read with openpyxl, imported on the first upload.
+
+SPREADSHEET_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def read_rows(stream, filename, required_columns):
+    # stream is a binary file object; the format is picked from the filename
+    if filename.lower().endswith(SPREADSHEET_EXTENSIONS):
+        return _read_xlsx(stream, required_columns)
+    return _read_csv(stream, required_columns)
+
+
+def _header(values, required_columns):
+    header = [str(v).strip().lower() if v is not None else "" for v in values]
+    missing = [c for c in required_columns if c not in header]
+    if missing:
+        raise ImportFormatError(f"Missing columns: {', '.join(missing)}")
+    return header
+
+
+def _blank(values):
+    return all(v is None or str(v).strip() == "" for v in values)
+
+
+def _read_csv(stream, required_columns):
+    reader = csv.reader(codecs.iterdecode(stream, "utf-8-sig"))
+    try:
+        first = next(reader, None)
+        if first is None:
+            raise ImportFormatError("File is empty")
+        header = _header(first, required_columns)
+        for values in reader:
+            if not _blank(values):
+                yield reader.line_num, dict(zip(header, values))
+    except UnicodeDecodeError:
+        raise ImportFormatError("CSV files must be UTF-8 encoded")
+    except csv.Error as e:
+        raise ImportFormatError(f"Malformed CSV: {e}")
+
+
+def _read_xlsx(stream, required_columns):
+    try:
+        import openpyxl  # in requirements.txt; imported here to keep startup light
+    except ImportError:
+        raise ImportFormatError("Spreadsheet imports need openpyxl; upload a CSV instead")
+
+    try:
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, OSError, ValueError):
+        raise ImportFormatError("Not a valid XLSX file")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        first = next(rows, None)
+        if first is None:
+            raise ImportFormatError("File is empty")
+        header = _header(first, required_columns)
+        for line, values in enumerate(rows, start=2):
+            if not _blank(values):
+                yield line, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def parse_number(value):
+    # Empty cells are None; "1,20,000" and "120000.00" are both accepted
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip().replace(",", "")
+    return float(value) if value else None
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -2,19 +2,34 @@ import jwt
 from flask import request, jsonify
 from functools import wraps
 import os  # ✅ Add this
+import time
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 JWT_SECRET = os.getenv("JWT_SECRET")
+# Seconds; unset keeps the old non-expiring tokens
+JWT_ACCESS_TOKEN_EXPIRES = os.getenv("JWT_ACCESS_TOKEN_EXPIRES")
 
 
-def generate_token(user):
+def generate_token(user, claims=None):
+    # One format for both token_required and flask_jwt_extended routes.
+    # `claims` carries the versioned identity claims (eid, did, is_pm, ...).
+    now = int(time.time())
     payload = {
         "sub": str(user.id),
         "id": user.id,
         "role": user.role,
-        "email": user.email
+        "email": user.email,
+        "type": "access",
+        "fresh": False,
+        "jti": uuid.uuid4().hex,
+        "iat": now
     }
+    if claims:
+        payload.update(claims)
+    if JWT_ACCESS_TOKEN_EXPIRES:
+        payload["exp"] = now + int(JWT_ACCESS_TOKEN_EXPIRES)
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
 def decode_token(token):
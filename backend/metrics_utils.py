@@ -0,0 +1,323 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint request metrics in Prometheus text format.
+#
+# For every request we record latency, SQL statements executed, time spent in
+# the database, rows fetched and response bytes, keyed by Flask endpoint.
+# Requests running more than METRICS_QUERY_BUDGET statements are counted,
+# logged and marked with an X-Query-Budget-Exceeded header, which makes N+1
+# query patterns visible straight away.
+#
+# Streamed responses (exports, ?stream=1) run most of their SQL after the view
+# returns, so they are recorded when the stream is closed.
+#
+# Every worker keeps its own totals and writes them to its own file in
+# METRICS_DIR (default /tmp/maxprofit-metrics) every METRICS_FLUSH_SECONDS.
+# A scrape, whichever worker serves it, adds up every file, so counters cover
+# all workers, including ones that have since exited. gunicorn clears the
+# directory when it starts. METRICS_DIR="" keeps metrics per process.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def state(self):
+        return {"counts": self.counts, "sum": self.sum, "count": self.count}
+
+    def merge(self, state):
+        self.counts = [a + b for a, b in zip(self.counts, state["counts"])]
+        self.sum += state["sum"]
+        self.count += state["count"]
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.rows = Histogram(ROW_BUCKETS)
+        self.response_bytes = Histogram(BYTE_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses = defaultdict(int)
+        self.over_budget = 0
+
+    def state(self):
+        return {
+            "latency": self.latency.state(),
+            "queries": self.queries.state(),
+            "rows": self.rows.state(),
+            "response_bytes": self.response_bytes.state(),
+            "db_seconds": self.db_seconds,
+            "statuses": self.statuses,
+            "over_budget": self.over_budget,
+        }
+
+    def merge(self, state):
+        for name in ("latency", "queries", "rows", "response_bytes"):
+            getattr(self, name).merge(state[name])
+        self.db_seconds += state["db_seconds"]
+        for status, count in state["statuses"].items():
+            self.statuses[int(status)] += count
+        self.over_budget += state["over_budget"]
+
+
+def shared_dir():
+    return os.getenv("METRICS_DIR", "/tmp/maxprofit-metrics") or None
+
+
+def clear_shared_dir():
+    # Called once when the server starts, before any worker writes
+    path = shared_dir()
+    if path is None:
+        return
+    for name in glob.glob(os.path.join(path, "*.json")):
+        try:
+            os.remove(name)
+        except OSError:
+            pass
+
+
+class Metrics:
+    def __init__(self, app=None, query_budget=None):
+        self.query_budget = query_budget or int(os.getenv("METRICS_QUERY_BUDGET", "20"))
+        self.shared_dir = shared_dir()
+        self.flush_seconds = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(EndpointStats)
+        self._pid = None
+        self._path = None
+        self._dirty = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # ------------------ hooks ------------------
+
+    def _start(self):
+        g.metrics = {"start": time.perf_counter(), "queries": 0, "db_seconds": 0.0, "rows": 0}
+
+    @staticmethod
+    def _current():
+        try:
+            return g.get("metrics")
+        except RuntimeError:  # outside a request/app context (CLI, background threads)
+            return None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current() is not None:
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        current = self._current()
+        if current is None or not conn.info.get("query_start"):
+            return
+        current["queries"] += 1
+        current["db_seconds"] += time.perf_counter() - conn.info["query_start"].pop()
+        # A server-side cursor (yield_per) has no row count yet; pymysql's
+        # SSCursor reports 2**64-1. Those rows are counted by count_rows.
+        if context is not None and context.execution_options.get("stream_results"):
+            return
+        if cursor.description is not None and 0 < cursor.rowcount < 2 ** 63:
+            current["rows"] += cursor.rowcount
+
+    def count_rows(self, rows):
+        # Passes rows through, adding each one read to the current request
+        current = self._current()
+        try:
+            for row in rows:
+                if current is not None:
+                    current["rows"] += 1
+                yield row
+        finally:
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()
+
+    def _finish(self, response):
+        endpoint = request.endpoint or "unmatched"
+        if response.is_streamed:
+            # g.metrics stays in place so the statements the stream runs are
+            # still counted; X-Query-Count only covers the ones run so far
+            current = g.get("metrics")
+            if current is None:
+                return response
+            response.headers["X-Query-Count"] = str(current["queries"])
+            response.response = self._measure_stream(response.response, current, endpoint, response.status_code)
+            return response
+
+        current = g.pop("metrics", None)
+        if current is None:
+            return response
+        response.headers["X-Query-Count"] = str(current["queries"])
+        if self._record(endpoint, current, response.status_code, response.content_length):
+            response.headers["X-Query-Budget-Exceeded"] = "1"
+        return response
+
+    def _measure_stream(self, chunks, current, endpoint, status):
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk) if isinstance(chunk, bytes) else len(chunk.encode())
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            self._record(endpoint, current, status, size)
+
+    def _record(self, endpoint, current, status, size):
+        # Returns whether the request went over the query budget
+        elapsed = time.perf_counter() - current["start"]
+        over_budget = current["queries"] > self.query_budget
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats.latency.observe(elapsed)
+            stats.queries.observe(current["queries"])
+            stats.rows.observe(current["rows"])
+            if size is not None:
+                stats.response_bytes.observe(size)
+            stats.db_seconds += current["db_seconds"]
+            stats.statuses[status // 100 * 100] += 1
+            stats.over_budget += over_budget
+            self._dirty = True
+        self._start_flusher()
+
+        if over_budget:
+            logger.warning("%s ran %d SQL statements (budget %d) in %.1f ms",
+                           endpoint, current["queries"], self.query_budget, elapsed * 1000,
+                           extra={"endpoint": endpoint, "queries": current["queries"]})
+        return over_budget
+
+    # ------------------ sharing between workers ------------------
+
+    def _start_flusher(self):
+        # One file and one flush thread per process, started on its first request
+        if self.shared_dir is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._path = os.path.join(self.shared_dir, f"{self._pid}-{uuid.uuid4().hex[:8]}.json")
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+        atexit.register(self._flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            if not self._dirty or self._pid != os.getpid():
+                return
+            data = json.dumps({name: stats.state() for name, stats in self._endpoints.items()})
+            self._dirty = False
+        try:
+            os.makedirs(self.shared_dir, exist_ok=True)
+            tmp = self._path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, self._path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", self._path, e)
+
+    def _collect(self):
+        # A copy of the totals to render: this process only, or every worker
+        if self.shared_dir is None:
+            with self._lock:
+                snapshots = [{name: stats.state() for name, stats in self._endpoints.items()}]
+        else:
+            self._flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.shared_dir, "*.json")):
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):  # a worker's file being replaced
+                    continue
+
+        endpoints = defaultdict(EndpointStats)
+        for snapshot in snapshots:
+            for name, state in snapshot.items():
+                endpoints[name].merge(state)
+        return sorted(endpoints.items())
+
+    # ------------------ exposition ------------------
+
+    def render(self):
+        endpoints = self._collect()
+        lines = [
+            "# HELP http_request_duration_seconds Request latency per endpoint",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for name, stats in endpoints:
+            lines += stats.latency.lines("http_request_duration_seconds", f'endpoint="{name}"')
+        lines += ["# HELP http_request_sql_statements SQL statements executed per request",
+                  "# TYPE http_request_sql_statements histogram"]
+        for name, stats in endpoints:
+            lines += stats.queries.lines("http_request_sql_statements", f'endpoint="{name}"')
+        lines += ["# HELP http_request_rows_fetched Rows returned by SELECTs per request",
+                  "# TYPE http_request_rows_fetched histogram"]
+        for name, stats in endpoints:
+            lines += stats.rows.lines("http_request_rows_fetched", f'endpoint="{name}"')
+        lines += ["# HELP http_response_size_bytes Response body size per request",
+                  "# TYPE http_response_size_bytes histogram"]
+        for name, stats in endpoints:
+            lines += stats.response_bytes.lines("http_response_size_bytes", f'endpoint="{name}"')
+        lines += ["# HELP http_request_db_seconds_total Time spent executing SQL",
+                  "# TYPE http_request_db_seconds_total counter"]
+        for name, stats in endpoints:
+            lines.append(f'http_request_db_seconds_total{{endpoint="{name}"}} {stats.db_seconds:.6f}')
+        lines += ["# HELP http_requests_total Requests per endpoint and status class",
+                  "# TYPE http_requests_total counter"]
+        for name, stats in endpoints:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'http_requests_total{{endpoint="{name}",status="{status}"}} {count}')
+        lines += [f"# HELP http_requests_over_query_budget_total Requests running more than {self.query_budget} SQL statements",
+                  "# TYPE http_requests_over_query_budget_total counter"]
+        for name, stats in endpoints:
+            lines.append(f'http_requests_over_query_budget_total{{endpoint="{name}"}} {stats.over_budget}')
+        return "\n".join(lines) + "\n"
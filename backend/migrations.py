@@ -0,0 +1,204 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+# Versioned schema migrations, applied in order by `flask --app app db-upgrade`.
+# New tables still come from db.create_all(); migrations cover what create_all
+# cannot do on an existing database (indexes, constraints, backfills).
+# Keep every step additive so it can run while the old code is still serving,
+# and build indexes with online DDL (ALGORITHM=INPLACE, LOCK=NONE).
+# Backfills computed by application code register themselves from app.py with
+# the same @migration decorator.
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INT PRIMARY KEY,"
+        " description VARCHAR(255) NOT NULL,"
+        " applied_at DATETIME NOT NULL)"
+    ))
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] not in applied]
+
+
+def upgrade(engine, log=logger.info):
+    done = []
+    for version, description, fn in pending_migrations(engine):
+        log(f"Applying migration {version:04d}: {description}")
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {"version": version, "description": description, "applied_at": datetime.utcnow()}
+            )
+        done.append(version)
+    return done
+
+
+# ------------------ HELPERS ------------------
+
+def has_index(conn, table, columns, unique=False):
+    # True when an existing index (or unique constraint) already starts with
+    # these columns, so we never build a redundant one.
+    columns = list(columns)
+    inspector = inspect(conn)
+    indexes = [(i["column_names"], i.get("unique", False)) for i in inspector.get_indexes(table)]
+    indexes += [(u["column_names"], True) for u in inspector.get_unique_constraints(table)]
+    pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+    indexes.append((pk, True))
+    for cols, is_unique in indexes:
+        if unique and not (is_unique and cols == columns):
+            continue
+        if cols[:len(columns)] == columns:
+            return True
+    return False
+
+
+def create_index(conn, table, name, columns, unique=False):
+    if has_index(conn, table, columns, unique=unique):
+        return
+    cols = ", ".join(f"`{c}`" for c in columns)
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(
+        f"CREATE {kind} `{name}` ON `{table}` ({cols}) ALGORITHM=INPLACE LOCK=NONE"
+    ))
+
+
+def add_column(conn, table, name, ddl):
+    if name in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    conn.execute(text(
+        f"ALTER TABLE `{table}` ADD COLUMN `{name}` {ddl}, ALGORITHM=INPLACE, LOCK=NONE"
+    ))
+
+
+def find_duplicates(conn, table, columns, limit=20):
+    # (total duplicate groups, first `limit` of them as (key values..., row count))
+    cols = ", ".join(f"`{c}`" for c in columns)
+    groups = f"SELECT {cols}, COUNT(*) AS n FROM `{table}` GROUP BY {cols} HAVING COUNT(*) > 1"
+    total = conn.execute(text(f"SELECT COUNT(*) FROM ({groups}) d")).scalar()
+    sample = conn.execute(text(f"{groups} ORDER BY {cols} LIMIT {int(limit)}")).all() if total else []
+    return total, sample
+
+
+def require_unique(conn, table, columns):
+    # Refuse to build a unique index over duplicate rows; they hold business
+    # data, so resolving them is a decision for a person (see the
+    # delete-duplicates command), not for a startup migration.
+    total, sample = find_duplicates(conn, table, columns)
+    if not total:
+        return
+    lines = [f"{table} has {total} duplicate ({', '.join(columns)}) group(s):"]
+    lines += [f"  {dict(zip(columns, row[:-1]))} x{row[-1]}" for row in sample]
+    if total > len(sample):
+        lines.append(f"  ... and {total - len(sample)} more")
+    lines.append("Resolve them (e.g. `flask delete-duplicates`) and run the upgrade again.")
+    raise MigrationError("\n".join(lines))
+
+
+def delete_duplicates(conn, table, columns):
+    # Keep the newest row (highest id) of every duplicate group. Only run on
+    # request from the delete-duplicates command, never from a migration.
+    match = " AND ".join(f"a.`{c}` = b.`{c}`" for c in columns)
+    return conn.execute(text(
+        f"DELETE a FROM `{table}` a JOIN `{table}` b ON {match} AND a.id < b.id"
+    )).rowcount
+
+
+UNIQUE_KEYS = {
+    "project_assignment": ["project_id", "user_id"],
+    "employee_financials": ["eid", "financial_year"],
+}
+
+
+# ------------------ MIGRATIONS ------------------
+
+@migration(1, "Unique keys for assignments and employee financials")
+def unique_keys(conn):
+    require_unique(conn, "project_assignment", UNIQUE_KEYS["project_assignment"])
+    create_index(conn, "project_assignment", "uq_project_assignment_project_user",
+                 UNIQUE_KEYS["project_assignment"], unique=True)
+
+    require_unique(conn, "employee_financials", UNIQUE_KEYS["employee_financials"])
+    create_index(conn, "employee_financials", "uq_employee_financials_eid_year",
+                 UNIQUE_KEYS["employee_financials"], unique=True)
+
+
+@migration(2, "Indexes for hot lookup and range queries")
+def lookup_indexes(conn):
+    create_index(conn, "project_assignment", "ix_project_assignment_project_id", ["project_id"])
+    create_index(conn, "project_assignment", "ix_project_assignment_user_id", ["user_id"])
+    create_index(conn, "project", "ix_project_departmentId", ["departmentId"])
+    create_index(conn, "project", "ix_project_startDate_endDate", ["startDate", "endDate"])
+    create_index(conn, "project", "ix_project_endDate", ["endDate"])
+    create_index(conn, "user", "ix_user_role_status", ["role", "status"])
+    create_index(conn, "department", "ix_department_managerId", ["managerId"])
+    create_index(conn, "activity_log", "ix_activity_log_timestamp", ["timestamp"])
+
+
+@migration(3, "Indexes for filtered and sorted list endpoints")
+def list_indexes(conn):
+    create_index(conn, "user", "ix_user_did", ["did"])
+    create_index(conn, "project", "ix_project_name", ["name"])
+
+
+@migration(4, "Backfill department_managers from the managerIds CSV")
+def department_managers(conn):
+    rows = conn.execute(text("SELECT did, managerId, managerIds FROM department")).all()
+    mappings = []
+    for did, manager_id, manager_ids in rows:
+        eids = [e.strip() for e in (manager_ids or "").split(",") if e.strip()]
+        if not eids and manager_id:
+            eids = [manager_id.strip()]
+        for position, eid in enumerate(dict.fromkeys(eids)):
+            mappings.append({"did": did, "eid": eid, "position": position})
+    if mappings:
+        conn.execute(text(
+            "INSERT IGNORE INTO department_managers (department_did, manager_eid, position) "
+            "VALUES (:did, :eid, :position)"
+        ), mappings)
+
+
+@migration(5, "Index project_assignees by user and role for the login PM check")
+def project_assignees_user_role(conn):
+    create_index(conn, "project_assignees", "ix_project_assignees_user_id_role", ["user_id", "role"])
+
+
+@migration(6, "Token version per user for claim revocation")
+def user_token_version(conn):
+    add_column(conn, "user", "token_version", "INT NOT NULL DEFAULT 0")
+
+
+@migration(8, "Keyset indexes for the sortable user list columns")
+def user_sort_indexes(conn):
+    # Serves the list endpoints' ORDER BY column, id and the keyset cursor
+    # condition on the same pair (see pagination_utils._after)
+    for column in ("fname", "lname", "joinDate", "createdAt"):
+        create_index(conn, "user", f"ix_user_{column}_id", [column, "id"])
@@ -0,0 +1,132 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise PaginationError("Invalid cursor")
+    return values
+
+
+def parse_limit(args, default=None):
+    raw = args.get("limit")
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def parse_sort(args, sort_fields, default):
+    # sort=name ascending, sort=-name descending; only whitelisted fields
+    sort = args.get("sort", default)
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name not in sort_fields:
+        raise PaginationError(f"Cannot sort by '{name}'. Allowed: {', '.join(sorted(sort_fields))}")
+    return name, sort_fields[name], descending
+
+
+def apply_filters(query, args, filters):
+    # filters: {param: column}; comma-separated values become IN (...)
+    for param, column in filters.items():
+        value = args.get(param)
+        if value:
+            values = [v.strip() for v in value.split(",") if v.strip()]
+            query = query.filter(column.in_(values) if len(values) > 1 else column == values[0])
+    return query
+
+
+def _parse_date(value, param):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise PaginationError(f"{param} must be a date (YYYY-MM-DD)")
+
+
+def apply_date_range(query, args, start_column, end_column=None):
+    # from/to bound a single column, or test overlap with [start_column, end_column]
+    end_column = end_column if end_column is not None else start_column
+    if args.get("from"):
+        query = query.filter(end_column >= _parse_date(args["from"], "from"))
+    if args.get("to"):
+        to = _parse_date(args["to"], "to")
+        if start_column is end_column:
+            query = query.filter(start_column < to + timedelta(days=1))
+        else:
+            query = query.filter(start_column <= to)
+    return query
+
+
+def _after(column, id_column, value, last_id, descending):
+    # Rows strictly after (value, last_id) in ORDER BY column, id. MySQL sorts
+    # NULLs first ascending and last descending.
+    if descending:
+        if value is None:
+            return and_(column.is_(None), id_column < last_id)
+        return or_(column < value, and_(column == value, id_column < last_id), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), id_column > last_id), column.isnot(None))
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+
+def page_query(query, args, sort_fields, default_sort, id_column, default_limit=None):
+    # The statement paginate runs: filtered past the cursor, ordered by the
+    # sort column and id, and limited to limit + 1 rows when there is a limit.
+    # Returns (query, column, limit, paged).
+    name, column, descending = parse_sort(args, sort_fields, default_sort)
+    paged = "limit" in args or "cursor" in args
+    limit = parse_limit(args, DEFAULT_LIMIT if paged else default_limit)
+
+    if args.get("cursor"):
+        value, last_id = decode_cursor(args["cursor"])
+        query = query.filter(_after(column, id_column, value, last_id, descending))
+
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query, column, limit, paged
+
+
+def paginate(query, args, sort_fields, default_sort, id_column, default_limit=None, stream=None):
+    # Returns (rows, next_cursor, paged). Without limit/cursor in the request and
+    # no default_limit the whole (filtered, sorted) result is returned, as
+    # stream(query) when a stream function is given (e.g. a server-side cursor).
+    query, column, limit, paged = page_query(query, args, sort_fields, default_sort, id_column, default_limit)
+
+    if limit is None:
+        return (stream(query) if stream else query.all()), None, paged
+
+    rows = query.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key), getattr(last, id_column.key)])
+    return rows, next_cursor, paged
@@ -0,0 +1,73 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from werkzeug.security import generate_password_hash, check_password_hash
+
+load_dotenv()
+
+# Password hashing with configurable parameters, run on a bounded worker pool.
+#
+# PASSWORD_HASH_METHOD / PASSWORD_SALT_LENGTH use werkzeug's format, e.g.
+# "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Hashes made with other
+# parameters still verify and are reported by needs_rehash().
+#
+# hashlib releases the GIL while hashing, so the pool gives real parallelism;
+# PASSWORD_WORKERS bounds the CPU spent on it and PASSWORD_QUEUE_SIZE bounds
+# how many requests may wait for a worker before we answer 503.
+
+HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+QUEUE_SIZE = int(os.getenv("PASSWORD_QUEUE_SIZE", str(WORKERS * 8)))
+QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", "2"))
+
+
+class PasswordBusy(RuntimeError):
+    pass
+
+
+# werkzeug expands the method (e.g. "scrypt" -> "scrypt:32768:8:1"), so take
+# the canonical prefix from a real hash.
+_CURRENT_METHOD = generate_password_hash("", method=HASH_METHOD, salt_length=SALT_LENGTH).split("$")[0]
+
+_executor = None
+_executor_pid = None
+_slots = threading.BoundedSemaphore(WORKERS + QUEUE_SIZE)
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    # Threads do not survive a fork, so every worker process gets its own pool
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="password")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=QUEUE_TIMEOUT):
+        raise PasswordBusy("Too many password checks in progress, try again shortly")
+    try:
+        return _pool().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    return _run(lambda: generate_password_hash(password, method=HASH_METHOD, salt_length=SALT_LENGTH))
+
+
+def verify_password(pwhash, password):
+    if not pwhash or password is None:
+        return False
+    return _run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    method, _, rest = (pwhash or "").partition("$")
+    salt = rest.partition("$")[0]
+    return method != _CURRENT_METHOD or len(salt) != SALT_LENGTH
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# Connection pool configuration and statistics.
+#
+# Pools are sized per traffic class from the environment, e.g. DB_POOL_SIZE
+# for transactional requests and DB_REPORT_POOL_SIZE for report endpoints
+# (falling back to the DB_POOL_* value when unset).
+
+
+def _env(prefix, name, default):
+    return os.getenv(f"{prefix}_{name}", os.getenv(f"DB_POOL_{name}", default))
+
+
+def engine_options(prefix="DB_POOL"):
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(_env(prefix, "SIZE", "10")),
+        "max_overflow": int(_env(prefix, "MAX_OVERFLOW", "10")),
+        "pool_timeout": float(_env(prefix, "TIMEOUT", "10")),
+        # Recycle before MySQL's wait_timeout closes idle connections
+        "pool_recycle": int(_env(prefix, "RECYCLE", "1800")),
+        "pool_pre_ping": _env(prefix, "PRE_PING", "1") == "1",
+    }
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long checkouts wait for a connection
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self):
+        with self._stats_lock:
+            checkouts, timeouts = self.checkouts, self.timeouts
+            wait_total, wait_max = self.wait_total, self.wait_max
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "wait_avg_ms": round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+            "wait_max_ms": round(wait_max * 1000, 3),
+        }
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if isinstance(pool, TimedQueuePool):
+        return pool.stats()
+    return {"status": pool.status()}
+
+
+class RoutingSession(Session):
+    # Sends a request's reads to the engine named in g.db_bind (see
+    # use_bind in app.py); flushes always go to the model's own bind.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            key = g.get("db_bind")
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
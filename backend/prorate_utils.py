@@ -0,0 +1,94 @@
+from datetime import date
+
+import numpy as np
+
+# Daily-prorated monthly totals.
+#
+# Each interval's values are spread over the months it spans in proportion to
+# the working days (Mon-Fri minus holidays, as in calendar_utils) that fall in
+# each month, then summed per (key, month). It is all array arithmetic: one
+# np.repeat expands intervals into (interval, month) segments, np.busday_count
+# counts the working days of every segment and np.bincount adds them up.
+#
+# Intervals without a start date go to year/month 0. Intervals without a
+# usable end date, or without any working day, go wholly to their start month.
+
+DENSE_GROUPS_PER_SEGMENT = 4  # above this many (key, month) cells per segment, sort instead
+_EPOCH = date(1970, 1, 1).toordinal()
+_NAT = np.datetime64("NaT").astype(np.int64)
+
+
+def to_days(dates):
+    # Sequence of date/None -> datetime64[D] array, None as NaT. Going through
+    # ordinals is much faster than letting numpy convert date objects.
+    days = [_NAT if d is None else d.toordinal() - _EPOCH for d in dates]
+    return np.array(days, dtype=np.int64).view("datetime64[D]")
+
+
+def prorate_by_month(keys, start, end, values, holidays=()):
+    # keys: (n,) ints, start/end: (n,) datetime64[D] with end inclusive,
+    # values: (n,) or (n, k) floats (NaN counts as 0).
+    # Returns (keys, years, months, sums) sorted by key and month; sums is (m, k).
+    keys = np.asarray(keys, dtype=np.int64)
+    start = np.asarray(start, dtype="datetime64[D]")
+    end = np.asarray(end, dtype="datetime64[D]")
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    if values.ndim == 1:
+        values = values[:, None]
+    holidays = np.asarray(sorted(holidays), dtype="datetime64[D]")
+
+    dated = np.flatnonzero(~np.isnat(start))
+    undated = np.flatnonzero(np.isnat(start))
+    first = start[dated]
+    last = end[dated]
+    last = np.where(np.isnat(last) | (last < first), first, last)
+
+    # Work in integer days and months since 1970-01; month_start[i] is the
+    # first day of month base + i
+    first_month = first.astype("datetime64[M]").astype(np.int64)
+    last_month = last.astype("datetime64[M]").astype(np.int64)
+    base = first_month.min() if len(dated) else 0
+    top = last_month.max() if len(dated) else 0
+    month_start = np.arange(base, top + 2).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+    # One segment per (interval, month it touches)
+    spans = last_month - first_month + 1
+    segment = np.repeat(np.arange(len(dated)), spans)
+    offset = np.arange(len(segment)) - np.repeat(np.cumsum(spans) - spans, spans)
+    month = first_month[segment] - base + offset
+
+    segment_start = np.maximum(first.astype(np.int64)[segment], month_start[month])
+    segment_end = np.minimum(last.astype(np.int64)[segment] + 1, month_start[month + 1])
+    days = np.busday_count(segment_start.astype("datetime64[D]"), segment_end.astype("datetime64[D]"),
+                           holidays=holidays)
+    total = np.bincount(segment, weights=days, minlength=len(dated))[segment]
+    weight = np.where(total > 0, days / np.maximum(total, 1), offset == 0)
+
+    # Group on (key, month slot); slot 0 is "no start date"
+    source = np.concatenate([dated[segment], undated])
+    slot = np.concatenate([month + 1, np.zeros(len(undated), dtype=np.int64)])
+    weight = np.concatenate([weight, np.ones(len(undated))])
+    width = top - base + 2
+    unique_keys, key_index = np.unique(keys, return_inverse=True)
+    cell = key_index[source] * width + slot
+
+    cells = len(unique_keys) * width
+    if cells <= DENSE_GROUPS_PER_SEGMENT * max(len(cell), 1):
+        present = np.flatnonzero(np.bincount(cell, minlength=cells))
+        group = None
+    else:
+        present, group = np.unique(cell, return_inverse=True)
+
+    sums = np.empty((len(present), values.shape[1]))
+    for j in range(values.shape[1]):
+        contribution = values[source, j] * weight
+        if group is None:
+            sums[:, j] = np.bincount(cell, weights=contribution, minlength=cells)[present]
+        else:
+            sums[:, j] = np.bincount(group, weights=contribution, minlength=len(present))
+
+    out_slot = present % width
+    month_number = base + out_slot - 1  # months since 1970-01
+    years = np.where(out_slot == 0, 0, month_number // 12 + 1970)
+    months = np.where(out_slot == 0, 0, month_number % 12 + 1)
+    return unique_keys[present // width], years, months, sums
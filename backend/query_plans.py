@@ -0,0 +1,46 @@
+# EXPLAIN-based checks for the hot queries behind the API endpoints.
+# Run with `flask --app app check-query-plans` or tests/test_query_plans.py
+# against a database that has realistic data in it (seed_data.py --scale
+# reference); MySQL happily full-scans tiny tables.
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    result = conn.exec_driver_sql("EXPLAIN " + str(compiled), params)
+    return [dict(row._mapping) for row in result]
+
+
+def full_scans(plan):
+    # type=ALL on a real table is a full table scan; derived tables
+    # (<derived2>, <subquery3>) are materialized results and are fine.
+    return [
+        row for row in plan
+        if row.get("type") == "ALL" and not str(row.get("table") or "").startswith("<")
+    ]
+
+
+def filesorts(plan):
+    return [row for row in plan if "filesort" in str(row.get("Extra") or "")]
+
+
+def problems(plan):
+    scans = ", ".join(str(row.get("table")) for row in full_scans(plan))
+    sorts = ", ".join(str(row.get("table")) for row in filesorts(plan))
+    return ([f"full table scan on {scans}"] if scans else []) + ([f"filesort on {sorts}"] if sorts else [])
+
+
+def check(conn, queries, allowed=()):
+    # queries: {name: statement}; returns {name: [problem, ...]} for every
+    # query not in `allowed` that full-scans a table or sorts without an index
+    failures = {}
+    for name, stmt in queries.items():
+        if name in allowed:
+            continue
+        found = problems(explain(conn, stmt))
+        if found:
+            failures[name] = found
+    return failures
@@ -0,0 +1,180 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from heapq import nsmallest
+
+# In-process search index over users (eid, first/last name, email).
+#
+# - A sorted list of (token, id) answers prefix queries with a bisect.
+# - Trigram postings answer substring queries of 3+ characters.
+# Prefix matches rank above plain substring matches, so type-ahead stays fast
+# even when a query matches most of the table.
+#
+# The index is tagged with the version of its source data it was built from.
+# Callers compare that with the shared version and rebuild when another
+# process has changed the data; a rebuild swaps in the new index only when it
+# is done, so searches keep using the old one meanwhile. Changes committed by
+# this process are applied in place when they carry the next version.
+#
+# Each document also keeps a few filter attributes (lowercased strings), and
+# search(where=...) applies them while walking the index, so a filter never
+# shortens the page of results.
+
+_TOKEN_SPLIT = re.compile(r"[\s@._\-]+")
+PREFIX_SCAN_LIMIT = 1000
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _normalize(fields):
+    return tuple((f or "").strip().lower() for f in fields)
+
+
+def _normalize_attrs(attrs):
+    return {name: str(value).strip().lower() for name, value in attrs.items() if value is not None}
+
+
+def _tokens(fields):
+    tokens = set()
+    for field in fields:
+        if field:
+            tokens.add(field)
+            tokens.update(t for t in _TOKEN_SPLIT.split(field) if t)
+    return tokens
+
+
+class UserSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}                   # id -> (eid, fname, lname, email), lowercased
+        self._attrs = {}                  # id -> {filter name: lowercased value}
+        self._sorted = []                 # sorted (token, id)
+        self._grams = defaultdict(set)    # trigram -> ids
+        self.version = None               # source table version, None until built
+
+    # ------------------ maintenance ------------------
+
+    def rebuild(self, rows, version):
+        # rows: iterable of (id, eid, fname, lname, email, attrs) read at `version`
+        docs, attrs, pairs, grams = {}, {}, [], defaultdict(set)
+        for user_id, eid, fname, lname, email, user_attrs in rows:
+            fields = _normalize((eid, fname, lname, email))
+            docs[user_id] = fields
+            attrs[user_id] = _normalize_attrs(user_attrs)
+            pairs.extend((token, user_id) for token in _tokens(fields))
+            for gram in set().union(*map(_trigrams, fields)):
+                grams[gram].add(user_id)
+        pairs.sort()
+
+        with self._lock:
+            if self.version is not None and version < self.version:
+                return  # built from an older snapshot than the current index
+            self._docs, self._attrs, self._sorted, self._grams = docs, attrs, pairs, grams
+            self.version = version
+
+    def apply(self, changes, version):
+        # changes: {id: (eid, fname, lname, email, attrs) or None for a delete},
+        # committed as `version`. Anything but the next version means another
+        # process wrote in between; the index is left behind and the next
+        # search starts a rebuild that includes these changes.
+        with self._lock:
+            if self.version is None or version != self.version + 1:
+                return
+            for user_id, doc in changes.items():
+                self._remove(user_id)
+                if doc is not None:
+                    self._add(user_id, *doc)
+            self.version = version
+
+    def _add(self, user_id, eid, fname, lname, email, attrs):
+        fields = _normalize((eid, fname, lname, email))
+        self._docs[user_id] = fields
+        self._attrs[user_id] = _normalize_attrs(attrs)
+        for token in _tokens(fields):
+            insort(self._sorted, (token, user_id))
+        for field in fields:
+            for gram in _trigrams(field):
+                self._grams[gram].add(user_id)
+
+    def _remove(self, user_id):
+        fields = self._docs.pop(user_id, None)
+        self._attrs.pop(user_id, None)
+        if fields is None:
+            return
+        for token in _tokens(fields):
+            i = bisect_left(self._sorted, (token, user_id))
+            if i < len(self._sorted) and self._sorted[i] == (token, user_id):
+                del self._sorted[i]
+        for field in fields:
+            for gram in _trigrams(field):
+                postings = self._grams.get(gram)
+                if postings is not None:
+                    postings.discard(user_id)
+                    if not postings:
+                        del self._grams[gram]
+
+    # ------------------ querying ------------------
+
+    def _rank(self, user_id, q, fallback):
+        # fallback: 3 when a token starts with q, 4 for a plain substring match
+        eid, fname, lname, email = fields = self._docs[user_id]
+        if eid == q:
+            score = 0
+        elif q in fields:
+            score = 1
+        elif any(f.startswith(q) for f in fields):
+            score = 2
+        else:
+            score = fallback
+        return (score, fname, lname, eid)
+
+    def _accepts(self, user_id, where):
+        attrs = self._attrs[user_id]
+        return all(attrs.get(name) in values for name, values in where.items())
+
+    def _name_order(self, user_id):
+        eid, fname, lname, email = self._docs[user_id]
+        return (fname, lname, eid)
+
+    def search(self, q, limit=20, where=None):
+        # where: {filter name: iterable of accepted values}; matched case-insensitively
+        q = (q or "").strip().lower()
+        if not q:
+            return []
+        where = {name: {str(v).strip().lower() for v in values} for name, values in (where or {}).items()}
+
+        with self._lock:
+            matches = {}
+
+            # Prefix matches on any token; rows dropped by a filter do not
+            # count towards the scan limit
+            i = bisect_left(self._sorted, (q,))
+            scanned = 0
+            while i < len(self._sorted) and scanned < PREFIX_SCAN_LIMIT:
+                token, user_id = self._sorted[i]
+                if not token.startswith(q):
+                    break
+                i += 1
+                if user_id in matches or not self._accepts(user_id, where):
+                    continue
+                matches[user_id] = self._rank(user_id, q, 3)
+                scanned += 1
+
+            # Substring matches, only as many as are needed to fill the page.
+            # They all rank 4 and then by name, so walking the candidates in
+            # name order and stopping early still returns the best ones.
+            if len(matches) < limit and len(q) >= 3:
+                postings = sorted((self._grams.get(g, ()) for g in _trigrams(q)), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+                for user_id in sorted(candidates - matches.keys(), key=self._name_order):
+                    if not self._accepts(user_id, where):
+                        continue
+                    if any(q in field for field in self._docs[user_id]):
+                        matches[user_id] = self._rank(user_id, q, 4)
+                        if len(matches) >= limit:
+                            break
+
+            return nsmallest(limit, matches, key=matches.get)
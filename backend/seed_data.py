@@ -0,0 +1,242 @@
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from app import (
+    app, db, ActivityLog, Department, EmployeeFinancials, FinancialYear, Organisation, Project,
+    ProjectAssignment, User, department_managers, hourly_cost, project_assignees,
+    rebuild_project_aggregates,
+)
+from calendar_utils import working_hours_many
+from password_utils import hash_password
+
+# Reproducible synthetic organisation for benchmarks and local testing.
+#
+#   python seed_data.py --scale reference --reset
+#
+# The same --seed and scale always produce the same rows. Every seeded user
+# has the password given by --password.
+
+SCALES = {
+    "small": dict(organisations=1, departments=10, users=500, projects=100,
+                  assignments=5_000, activities=2_000),
+    "medium": dict(organisations=2, departments=40, users=5_000, projects=1_000,
+                   assignments=100_000, activities=50_000),
+    "reference": dict(organisations=3, departments=100, users=20_000, projects=5_000,
+                      assignments=500_000, activities=200_000),
+}
+
+TABLES = [  # children first
+    department_managers, project_assignees, ProjectAssignment.__table__, ActivityLog.__table__,
+    EmployeeFinancials.__table__, Project.__table__, User.__table__, Department.__table__,
+    Organisation.__table__, FinancialYear.__table__,
+]
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Ananya", "Vikram", "Meera", "Arjun", "Divya", "Karan",
+               "Sneha", "Rohan", "Isha", "Aditya", "Kavya", "Nikhil", "Pooja", "Siddharth", "Neha",
+               "John", "Maria", "David", "Sarah", "Michael", "Laura", "Daniel", "Emma"]
+LAST_NAMES = ["Sharma", "Iyer", "Nair", "Patel", "Reddy", "Menon", "Gupta", "Kumar", "Singh",
+              "Rao", "Das", "Joshi", "Pillai", "Verma", "Smith", "Johnson", "Brown", "Garcia"]
+ASSIGNEE_ROLES = ["Developer", "Tester", "Designer", "Analyst", "Consultant"]
+
+CHUNK = 5_000
+
+
+def insert(conn, table, rows):
+    for i in range(0, len(rows), CHUNK):
+        conn.execute(table.insert(), rows[i:i + CHUNK])
+
+
+def financial_year_of(day):
+    fy_start = day.year if day.month >= 4 else day.year - 1
+    return f"{fy_start}-{fy_start + 1}"
+
+
+def seed(scale, seed=42, first_year=2023, years=2, password="password123"):
+    rng = random.Random(seed)
+    now = datetime(first_year + years, 3, 31)
+    fy_labels = [f"{y}-{y + 1}" for y in range(first_year, first_year + years)]
+    fy_start, fy_end = date(first_year, 4, 1), date(first_year + years, 3, 31)
+    span = (fy_end - fy_start).days
+    pwhash = hash_password(password)
+    counts = {}
+
+    with db.engine.begin() as conn:
+        insert(conn, FinancialYear.__table__, [{"label": label} for label in fy_labels])
+
+        oids = [f"ORG{i:03d}" for i in range(1, scale["organisations"] + 1)]
+        insert(conn, Organisation.__table__, [
+            {"oid": oid, "name": f"Organisation {i}", "createdAt": now} for i, oid in enumerate(oids, 1)
+        ])
+
+        dids = [f"D{i:03d}" for i in range(1, scale["departments"] + 1)]
+
+        # Users: a manager or two per department, ~5% project managers, the rest employees
+        n_users = scale["users"]
+        manager_slots = {}
+        for did in dids:
+            manager_slots[did] = rng.sample(range(1, n_users), rng.choice((1, 1, 2)))
+        manager_of = {u: did for did, users in manager_slots.items() for u in users}
+        users = []
+        for i in range(n_users):
+            fname, lname = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            if i == 0:
+                role = "admin"
+            elif i in manager_of:
+                role = "department_manager"
+            elif rng.random() < 0.05:
+                role = "project_manager"
+            elif rng.random() < 0.02:
+                role = "financial_analyst"
+            else:
+                role = "employee"
+            users.append({
+                "eid": f"E{i + 1:05d}",
+                "fname": fname,
+                "lname": lname,
+                "email": f"{fname.lower()}.{lname.lower()}.{i + 1}@example.com",
+                "password": pwhash,
+                "role": role,
+                "did": manager_of.get(i) or rng.choice(dids),
+                "working_hours": 8,
+                "joinDate": fy_start - timedelta(days=rng.randint(0, 3650)),
+                "status": "active" if rng.random() < 0.95 else "inactive",
+                "createdAt": now,
+            })
+        users[0].update(email="admin@example.com", did="ADMIN")
+        insert(conn, User.__table__, users)
+        user_ids = dict(conn.execute(select(User.eid, User.id)).all())
+
+        insert(conn, Department.__table__, [
+            {
+                "did": did,
+                "name": f"Department {did}",
+                "oid": rng.choice(oids),
+                "managerId": users[manager_slots[did][0]]["eid"],
+                "managerIds": ",".join(users[u]["eid"] for u in manager_slots[did]),
+                "createdAt": now,
+            } for did in dids
+        ])
+        insert(conn, department_managers, [
+            {"department_did": did, "manager_eid": users[u]["eid"], "position": pos}
+            for did in dids for pos, u in enumerate(manager_slots[did])
+        ])
+
+        # Salaries are monthly
+        financials = []
+        for u in users:
+            base = rng.randint(30, 200) * 1000
+            for k, label in enumerate(fy_labels):
+                salary = round(base * (1 + 0.08 * k), 2)
+                infrastructure = rng.randint(2, 10) * 1000
+                financials.append({
+                    "eid": u["eid"], "financial_year": label, "salary": salary,
+                    "infrastructure": infrastructure,
+                    "hourly_cost": hourly_cost(salary, infrastructure),
+                    "created_at": now, "updated_at": now,
+                })
+        insert(conn, EmployeeFinancials.__table__, financials)
+        hourly_costs = {(f["eid"], f["financial_year"]): f["hourly_cost"] for f in financials}
+
+        projects = []
+        for i in range(1, scale["projects"] + 1):
+            start = fy_start + timedelta(days=rng.randint(0, span - 30))
+            end = min(start + timedelta(days=rng.randint(30, 365)), fy_end)
+            projects.append({
+                "name": f"Project {i:05d}", "departmentId": rng.choice(dids),
+                "startDate": start, "endDate": end, "budget": rng.randint(10, 500) * 10000,
+                "createdAt": now,
+            })
+        insert(conn, Project.__table__, projects)
+        project_rows = conn.execute(select(Project.id, Project.startDate, Project.endDate)).all()
+
+        # Assignments: the same number per project, percentages summing to <= 100
+        per_project = max(1, scale["assignments"] // len(project_rows))
+        eids = [u["eid"] for u in users[1:]]
+        assignments, links, intervals = [], [], []
+        for project_id, start, end in project_rows:
+            members = rng.sample(eids, min(per_project, len(eids)))
+            share = max(1, 100 // len(members))
+            for k, eid in enumerate(members):
+                a_start = start + timedelta(days=rng.randint(0, max((end - start).days // 4, 0)))
+                percentage = rng.randint(max(1, share // 2), share)
+                assignments.append({
+                    "project_id": project_id, "user_id": user_ids[eid], "eid": eid,
+                    "allocated_percentage": percentage, "billing_rate": rng.randint(5, 30) * 100,
+                    "start_date": a_start, "end_date": end, "created_at": now, "updated_at": now,
+                })
+                intervals.append((a_start, end, percentage))
+                links.append({
+                    "project_id": project_id, "user_id": user_ids[eid],
+                    "role": "Project Manager" if k == 0 else rng.choice(ASSIGNEE_ROLES),
+                })
+        for a, hours in zip(assignments, working_hours_many(intervals)):
+            eid = a.pop("eid")
+            a["allocated_hours"] = int(hours)
+            a["cost"] = round(a["billing_rate"] * hours, 2)
+            a["actual_cost"] = round(hourly_costs[(eid, financial_year_of(a["start_date"]))] * hours, 2)
+        insert(conn, ProjectAssignment.__table__, assignments)
+        insert(conn, project_assignees, links)
+
+        entities = [("Employee", "created"), ("Employee", "updated"), ("Project", "created"),
+                    ("Project", "updated"), ("Department", "updated")]
+        insert(conn, ActivityLog.__table__, [
+            {
+                "type": entity, "action": action,
+                "name": rng.choice(projects)["name"] if entity == "Project" else rng.choice(users)["fname"],
+                "timestamp": now - timedelta(seconds=rng.randint(0, span * 86400)),
+            }
+            for entity, action in (rng.choice(entities) for _ in range(scale["activities"]))
+        ])
+
+        for table in TABLES:
+            counts[table.name] = conn.execute(select(func.count()).select_from(table)).scalar()
+
+    rebuild_project_aggregates()
+    return counts
+
+
+def reset():
+    with db.engine.begin() as conn:
+        conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+        for table in TABLES + [db.metadata.tables["project_monthly_rollup"],
+                               db.metadata.tables["project_financials"]]:
+            conn.execute(text(f"TRUNCATE TABLE `{table.name}`"))
+        conn.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic organisation")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--first-year", type=int, default=2023)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--reset", action="store_true", help="empty the tables first")
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name}", type=int, help=f"override the scale's {name} count")
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    scale.update({name: getattr(args, name) for name in scale if getattr(args, name) is not None})
+
+    with app.app_context():
+        db.create_all()
+        existing = db.session.query(func.count(User.id)).scalar()
+        if existing and not args.reset:
+            parser.error(f"database already has {existing} users; pass --reset to replace them")
+        if args.reset:
+            reset()
+        started = time.time()
+        counts = seed(scale, args.seed, args.first_year, args.years, args.password)
+
+    print(f"✅ Seeded {args.scale} scale in {time.time() - started:.1f}s")
+    for table, count in counts.items():
+        print(f"   {table:22} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Response, stream_with_context
+
+# Streaming responses: rows come from a server-side cursor (Query.yield_per)
+# and are written as CSV, NDJSON or a JSON array by a generator, so memory
+# stays flat however many rows there are and the first bytes leave as soon
+# as the first chunk is read.
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+FLUSH_ROWS = 500  # rows per chunk written to the socket
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([_plain(row.get(c)) for c in columns])
+        if i % FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(columns, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({c: _plain(row.get(c)) for c in columns}))
+        if len(lines) == FLUSH_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def json_array_chunks(items, dumps):
+    # The same array a single dumps(list(items)) would give, one chunk at a time
+    yield "["
+    separator = ""
+    batch = []
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) == FLUSH_ROWS:
+            yield separator + ",".join(batch)
+            separator = ","
+            batch = []
+    if batch:
+        yield separator + ",".join(batch)
+    yield "]\n"
+
+
+def json_array_response(items, dumps):
+    return Response(stream_with_context(json_array_chunks(items, dumps)), mimetype="application/json")
+
+
+def export_response(rows, columns, fmt, filename):
+    # rows is an iterable of dicts, consumed while the response is sent
+    chunks = csv_chunks if fmt == "csv" else ndjson_chunks
+    return Response(
+        stream_with_context(chunks(columns, rows)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy.exc import SQLAlchemyError
+
+# EXPLAIN checks for the hot queries (see query_plans.py and app.hot_queries).
+# They need the MySQL database from .env with realistic data in it:
+#
+#   python seed_data.py --scale reference --reset
+#   python -m pytest tests/test_query_plans.py
+#
+# Without a configured MySQL database the module is skipped.
+
+try:
+    from app import app, db, hot_queries, WHOLE_TABLE_QUERIES
+except Exception as e:  # missing DB_*/JWT_SECRET settings
+    pytest.skip(f"app is not configured: {e}", allow_module_level=True)
+
+import query_plans
+
+with app.app_context():
+    INDEXED_QUERIES = sorted(set(hot_queries()) - WHOLE_TABLE_QUERIES)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    with app.app_context():
+        if db.engine.dialect.name != "mysql":
+            pytest.skip("query plans are only checked on MySQL")
+        try:
+            connection = db.engine.connect()
+        except SQLAlchemyError as e:
+            pytest.skip(f"database is not reachable: {e}")
+        with connection:
+            yield connection
+
+
+@pytest.mark.parametrize("name", INDEXED_QUERIES)
+def test_hot_query_uses_indexes(conn, name):
+    with app.app_context():
+        plan = query_plans.explain(conn, hot_queries()[name])
+    assert query_plans.problems(plan) == [], plan
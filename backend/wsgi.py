@@ -0,0 +1,13 @@
+import os
+
+import migrations
+from app import app, db
+
+# WSGI entry point. With gunicorn's preload this runs once, in the master,
+# before the workers are forked.
+
+if os.getenv("RUN_MIGRATIONS", "1") == "1":
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade(db.engine)
+        db.engine.dispose()
@@ -0,0 +1,58 @@
+import axios from 'axios';
+
+const API = process.env.REACT_APP_API_BASE_URL;
+
+// The backend revokes a user's tokens when their role, department or status
+// changes. On a 401, ask for a token with the current claims once and retry
+// the request with it; if that fails too, the session is over.
+let refreshing = null;
+
+const refreshToken = () => {
+  if (!refreshing) {
+    refreshing = axios
+      .post(`${API}/api/token/refresh`, null, {
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+        skipRefresh: true,
+      })
+      .then((res) => {
+        localStorage.setItem('token', res.data.token);
+        localStorage.setItem('userName', res.data.userName);
+        return res.data.token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
+const isAuthCall = (url = '') =>
+  url.includes('/api/login') || url.includes('/api/token/refresh');
+
+axios.interceptors.response.use(undefined, async (error) => {
+  const config = error.config;
+  if (
+    error.response?.status !== 401 ||
+    !config ||
+    config.skipRefresh ||
+    config.retriedAfterRefresh ||
+    isAuthCall(config.url) ||
+    !localStorage.getItem('token')
+  ) {
+    throw error;
+  }
+
+  let token;
+  try {
+    token = await refreshToken();
+  } catch (refreshError) {
+    localStorage.removeItem('token');
+    localStorage.removeItem('userName');
+    window.location.assign('/');
+    throw error;
+  }
+
+  config.retriedAfterRefresh = true;
+  config.headers.Authorization = `Bearer ${token}`;
+  return axios(config);
+});